@@ -0,0 +1,13 @@
+"""Бенчмарки АВЛ-дерева (task1) и хеш-таблицы (task2).
+
+Запуск: python -m benchmarks --help
+"""
+import os
+import sys
+
+# Модули заданий лежат в отдельных каталогах без пакетов -- добавляем их в путь поиска
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _task in ("task1", "task2"):
+    _path = os.path.join(_ROOT, _task)
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
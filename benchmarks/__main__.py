@@ -0,0 +1,92 @@
+import argparse
+import json
+import platform
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from .common import DISTRIBUTIONS, make_keys
+
+STRUCTURES = ("avl", "sorted_list", "hashmap", "incremental_hashmap", "compact_hashmap", "concurrent_hashmap", "dict")
+
+def run_structure(name: str, keys: List[int], repeat: int, memory: bool, seed: int) -> Dict[str, Dict[str, Any]]:
+    if name == "avl":
+        from .avl_bench import bench_avl_tree
+        return bench_avl_tree(keys, repeat, memory, seed)
+    if name == "sorted_list":
+        from .avl_bench import bench_sorted_list
+        return bench_sorted_list(keys, repeat, memory, seed)
+    if name == "dict":
+        from .dict_bench import bench_dict
+        return bench_dict(keys, repeat, memory, seed)
+    from .dict_bench import bench_map
+    return bench_map(name, keys, repeat, memory, seed)
+
+def run(sizes: List[int], distributions: List[str], structures: List[str], repeat: int, memory: bool, seed: int) -> List[Dict[str, Any]]:
+    records = []
+    for size in sizes:
+        for distribution in distributions:
+            keys = make_keys(distribution, size, seed)
+            for structure in structures:
+                print(f"{structure} n={size} {distribution}", file=sys.stderr)
+                for operation, stats in run_structure(structure, keys, repeat, memory, seed).items():
+                    records.append({"structure": structure, "operation": operation, "size": size, "distribution": distribution, **stats})
+    return records
+
+def _record_key(record: Dict[str, Any]) -> Tuple[str, str, int, str]:
+    return record["structure"], record["operation"], record["size"], record["distribution"]
+
+def compare(records: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[str]:
+    """Список регрессий: пропускная способность упала (или память выросла) больше чем на threshold"""
+    previous = {_record_key(record): record for record in baseline}
+    regressions = []
+    for record in records:
+        old = previous.get(_record_key(record))
+        if old is None:
+            continue
+        name = "/".join(str(part) for part in _record_key(record))
+        if record.get("ops_per_sec") and old.get("ops_per_sec"):
+            ratio = record["ops_per_sec"] / old["ops_per_sec"]
+            if ratio < 1 - threshold:
+                regressions.append(f"{name}: {old['ops_per_sec']:.0f} -> {record['ops_per_sec']:.0f} ops/sec ({ratio:.2f}x)")
+        if record.get("peak_memory_bytes") and old.get("peak_memory_bytes"):
+            ratio = record["peak_memory_bytes"] / old["peak_memory_bytes"]
+            if ratio > 1 + threshold:
+                regressions.append(f"{name}: {old['peak_memory_bytes']} -> {record['peak_memory_bytes']} bytes ({ratio:.2f}x)")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Бенчмарки AVLTree и HashMap")
+    parser.add_argument("--sizes", type=lambda s: int(float(s)), nargs="+", default=[1000, 10000, 100000], help="размеры входных данных (например, 1e3 1e7)")
+    parser.add_argument("--distributions", nargs="+", choices=DISTRIBUTIONS, default=list(DISTRIBUTIONS))
+    parser.add_argument("--structures", nargs="+", choices=STRUCTURES, default=list(STRUCTURES))
+    parser.add_argument("--repeat", type=int, default=5, help="число повторов для split/merge/traverse/resize")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="не замерять пиковую память (замер через tracemalloc медленный)")
+    parser.add_argument("--output", help="файл для JSON-отчёта (по умолчанию stdout)")
+    parser.add_argument("--baseline", help="JSON-отчёт предыдущего запуска для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.1, help="допустимое относительное ухудшение")
+    args = parser.parse_args(argv)
+
+    records = run(args.sizes, args.distributions, args.structures, args.repeat, not args.no_memory, args.seed)
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "seed": args.seed, "repeat": args.repeat},
+        "results": records,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(records, baseline, args.threshold)
+        for line in regressions:
+            print("REGRESSION", line, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import random
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, List
+
+from avl import AVLTree
+
+from .common import peak_memory, time_each, time_repeated
+
+def bench_avl_tree(keys: List[int], repeat: int, memory: bool, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """insert/search/split/merge/traverse/remove для AVLTree"""
+    shuffled = keys[:]
+    random.Random(seed).shuffle(shuffled)
+    results: Dict[str, Dict[str, Any]] = {}
+    tree = AVLTree()
+    results["insert"] = time_each(tree.insert, keys)
+    results["search"] = time_each(tree.search, shuffled)
+    pivot = tree.median()
+    # Разделение и слияние разрушают исходные деревья, поэтому работаем со снимками (O(1))
+    results["split"] = time_repeated(lambda: tree.snapshot().split(pivot), repeat)
+    left, right = tree.snapshot().split(pivot)
+    results["merge"] = time_repeated(lambda: left.snapshot().merge(right.snapshot()), repeat)
+    results["traverse"] = time_repeated(tree.traverse, repeat)
+    results["remove"] = time_each(tree.remove, shuffled)
+    if memory:
+        results["build"] = {"peak_memory_bytes": peak_memory(lambda: _build_tree(keys))}
+    return results
+
+def _build_tree(keys: List[int]) -> AVLTree:
+    tree = AVLTree()
+    for key in keys:
+        tree.insert(key)
+    return tree
+
+def bench_sorted_list(keys: List[int], repeat: int, memory: bool, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """Те же операции для отсортированного списка с bisect (эталон для сравнения)"""
+    shuffled = keys[:]
+    random.Random(seed).shuffle(shuffled)
+    results: Dict[str, Dict[str, Any]] = {}
+    items: List[int] = []
+    results["insert"] = time_each(lambda key: insort(items, key), keys)
+
+    def search(key: int) -> bool:
+        i = bisect_left(items, key)
+        return i < len(items) and items[i] == key
+    results["search"] = time_each(search, shuffled)
+    pivot = items[(len(items) - 1) // 2] if items else 0
+    results["split"] = time_repeated(lambda: (items[:bisect_right(items, pivot)], items[bisect_right(items, pivot):]), repeat)
+    left, right = items[:bisect_right(items, pivot)], items[bisect_right(items, pivot):]
+    results["merge"] = time_repeated(lambda: left + right, repeat)
+    results["traverse"] = time_repeated(lambda: list(items), repeat)
+
+    def remove(key: int) -> None:
+        del items[bisect_left(items, key)]
+    results["remove"] = time_each(remove, shuffled)
+    if memory:
+        results["build"] = {"peak_memory_bytes": peak_memory(lambda: sorted(keys))}
+    return results
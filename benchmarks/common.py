@@ -0,0 +1,60 @@
+import random
+import time
+import tracemalloc
+from array import array
+from typing import Any, Callable, Dict, Iterable, List
+
+DISTRIBUTIONS = ("sequential", "random", "skewed", "duplicates")
+
+def make_keys(distribution: str, n: int, seed: int = 0) -> List[int]:
+    """Положительные целые ключи заданного распределения"""
+    rng = random.Random(seed)
+    if distribution == "sequential":
+        return list(range(1, n + 1))
+    if distribution == "random":
+        return [rng.randint(1, 10 * n) for _ in range(n)]
+    if distribution == "skewed":
+        # Распределение Парето: небольшие ключи встречаются намного чаще остальных
+        return [min(int(rng.paretovariate(1.1)), 10 * n) for _ in range(n)]
+    if distribution == "duplicates":
+        return [rng.randint(1, n // 100 + 1) for _ in range(n)]
+    raise ValueError(f"Unknown distribution: {distribution}")
+
+def percentiles(latencies: array) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    if not ordered:
+        return {}
+    def at(q: float) -> float:
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+    return {"p50": at(0.5), "p90": at(0.9), "p99": at(0.99), "p999": at(0.999), "max": ordered[-1]}
+
+def time_each(op: Callable[[Any], Any], args: Iterable[Any]) -> Dict[str, Any]:
+    """Замер каждой операции по отдельности; в задержки входит и накладной расход таймера (десятки нс)"""
+    clock = time.perf_counter_ns
+    latencies = array('q')
+    for arg in args:
+        start = clock()
+        op(arg)
+        latencies.append(clock() - start)
+    total = sum(latencies)
+    return {
+        "ops": len(latencies),
+        "seconds": total / 1e9,
+        "ops_per_sec": len(latencies) / (total / 1e9) if total else None,
+        "latency_ns": percentiles(latencies),
+    }
+
+def time_repeated(op: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """Замер операции, которая выполняется целиком над всей структурой (split, merge, traverse)"""
+    return time_each(lambda _: op(), range(repeat))
+
+def peak_memory(build: Callable[[], Any]) -> int:
+    """Пиковый объём памяти (байт), выделенной при построении структуры"""
+    tracemalloc.start()
+    try:
+        structure = build()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del structure
+    return peak
@@ -0,0 +1,52 @@
+import random
+from typing import Any, Callable, Dict, List
+
+from .common import peak_memory, time_each, time_repeated
+
+def _map_factories() -> Dict[str, Callable[[], Any]]:
+    # dict_list использует синтаксис Python 3.12, поэтому импортируется только при замере хеш-таблиц
+    from dict_list import CompactHashMap, ConcurrentHashMap, HashMap
+    return {
+        "hashmap": HashMap,
+        "incremental_hashmap": lambda: HashMap(incremental=True),
+        "compact_hashmap": CompactHashMap,
+        "concurrent_hashmap": ConcurrentHashMap,
+    }
+
+MAP_STRUCTURES = ("hashmap", "incremental_hashmap", "compact_hashmap", "concurrent_hashmap")
+
+def bench_map(name: str, keys: List[int], repeat: int, memory: bool, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """put/get/remove/resize для реализации хеш-таблицы из dict_list"""
+    factory = _map_factories()[name]
+    unique = list(dict.fromkeys(keys))
+    random.Random(seed).shuffle(unique)
+    results: Dict[str, Dict[str, Any]] = {}
+    m = factory()
+    results["put"] = time_each(lambda key: m.put(key, key), keys)
+    results["get"] = time_each(m.get, unique)
+    if hasattr(m, "_rebuild"):
+        # Полное перехеширование всех элементов -- то, что происходит при расширении таблицы
+        results["resize"] = time_repeated(lambda: m._rebuild(m.capacity), repeat)
+    results["remove"] = time_each(m.remove, unique)
+    if memory:
+        results["build"] = {"peak_memory_bytes": peak_memory(lambda: _build_map(factory, keys))}
+    return results
+
+def _build_map(factory: Callable[[], Any], keys: List[int]) -> Any:
+    m = factory()
+    for key in keys:
+        m.put(key, key)
+    return m
+
+def bench_dict(keys: List[int], repeat: int, memory: bool, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """Те же операции для встроенного dict (эталон для сравнения)"""
+    unique = list(dict.fromkeys(keys))
+    random.Random(seed).shuffle(unique)
+    results: Dict[str, Dict[str, Any]] = {}
+    d: Dict[int, int] = {}
+    results["put"] = time_each(lambda key: d.__setitem__(key, key), keys)
+    results["get"] = time_each(d.__getitem__, unique)
+    results["remove"] = time_each(d.__delitem__, unique)
+    if memory:
+        results["build"] = {"peak_memory_bytes": peak_memory(lambda: {key: key for key in keys})}
+    return results
@@ -1,13 +1,64 @@
-from typing import Optional, Tuple, List
+import math
+import mmap
+import operator
+import os
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import groupby, repeat
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple, List, Union
+
+try:
+    import numpy as np
+except ImportError: # numpy нужен только для векторизованных пакетных запросов
+    np = None
+
+# Заголовок двоичного файла дерева: сигнатура, версия формата, количество различных ключей.
+# За ним следуют массивы int64 (little-endian) отсортированных ключей и накопленных количеств элементов
+_FILE_HEADER = struct.Struct("<4sIQ")
+_FILE_MAGIC = b"AVLT"
+_FILE_VERSION = 1
+
+def _read_header(data: bytes, file_size: int) -> int:
+    # Проверяет заголовок и размер файла, возвращает количество различных ключей
+    if len(data) < _FILE_HEADER.size:
+        raise ValueError("Not an AVL tree file")
+    magic, version, n = _FILE_HEADER.unpack(data[:_FILE_HEADER.size])
+    if magic != _FILE_MAGIC:
+        raise ValueError("Not an AVL tree file")
+    if version != _FILE_VERSION:
+        raise ValueError(f"Unsupported file version: {version}")
+    if file_size != _FILE_HEADER.size + 16 * n:
+        raise ValueError("Truncated AVL tree file")
+    return n
+
+class Monoid(NamedTuple):
+    # Агрегат поддерева: identity -- нейтральный элемент, lift(key, count) -- значение одного узла,
+    # combine(a, b) -- ассоциативное объединение значений соседних отрезков (a левее b)
+    identity: Any
+    lift: Callable[[int, int], Any]
+    combine: Callable[[Any, Any], Any]
+
+SUM = Monoid(0, operator.mul, operator.add) # Сумма ключей с учётом дубликатов
+MIN = Monoid(math.inf, lambda key, count: key, min)
+MAX = Monoid(-math.inf, lambda key, count: key, max)
 
 class AVLNode:
-    def __init__(self, key: int) -> None:
+    # __slots__ убирает у каждого узла __dict__: на Python 3.11 узел из шести полей занимает 80 байт вместо ~128
+    # (примерно в 1.6 раза меньше); каждый дополнительный слот добавляет 8 байт
+    __slots__ = ("key", "left", "right", "height", "size", "count", "owner")
+
+    def __init__(self, key: int, owner: Optional[object] = None) -> None:
         self.key: int = key
         self.left: Optional['AVLNode'] = None
         self.right: Optional['AVLNode'] = None
         self.height: int = 1
         self.size: int = 1  # Количество элементов в поддереве
         self.count: int = 1  # Количество повторяемых ключей в узле
+        self.owner: Optional[object] = owner  # Версия дерева, которой разрешено изменять узел на месте
     
     def __repr__(self) -> str:
         return f"AVLNode(key={self.key}, height={self.height}, size={self.size}, count={self.count})"
@@ -15,9 +66,95 @@ class AVLNode:
     def __str__(self) -> str:
         return str(self.key)
 
+class AggregateAVLNode(AVLNode):
+    # Узел дерева с агрегатом: слот agg есть только у таких узлов, поэтому дерево без агрегата за него не платит
+    __slots__ = ("agg",)
+
+    def __init__(self, key: int, owner: Optional[object] = None) -> None:
+        super().__init__(key, owner)
+        self.agg: Any = None  # Агрегат поддерева
+
 class AVLTree:
-    def __init__(self) -> None:
+    # Минимальное суммарное количество элементов, начиная с которого операции над мультимножествами
+    # распределяются по процессам: передача деревьев между процессами стоит O(n + m)
+    parallel_threshold = 1_000_000
+
+    def __init__(self, persistent: bool = False, aggregate: Optional[Monoid] = None) -> None:
         self.root: Optional[AVLNode] = None
+        # В персистентном режиме каждая операция записи копирует путь от корня, не трогая прежние версии
+        self.persistent = persistent
+        self._owner = object()
+        self._stats: Optional[Dict[str, int]] = None # Счётчики инструментирования (см. enable_stats)
+        self._flat_cache: Optional[Dict[str, Any]] = None # Плоское представление для пакетных запросов (см. _flat)
+        # Агрегат поддеревьев поддерживается отдельной версией _update, поэтому дерево без агрегата не платит за него
+        self.aggregate = aggregate
+        self._node_type = AVLNode
+        if aggregate is not None:
+            self._update = self._update_aggregate
+            self._node_type = AggregateAVLNode
+
+    @classmethod
+    def from_sorted(cls, keys: Iterable[int], aggregate: Optional[Monoid] = None) -> 'AVLTree':
+        """Построение идеально сбалансированного дерева из отсортированной последовательности ключей за O(n)"""
+        tree = cls(aggregate=aggregate)
+        tree.root = tree._build_sorted(keys)
+        return tree
+
+    @classmethod
+    def from_iterable(cls, keys: Iterable[int], aggregate: Optional[Monoid] = None) -> 'AVLTree':
+        """Построение сбалансированного дерева из произвольной последовательности ключей за O(n log n)"""
+        return cls.from_sorted(sorted(keys), aggregate)
+
+    def _build_sorted(self, keys: Iterable[int], check_keys: bool = True) -> Optional[AVLNode]:
+        # Сворачиваем дубликаты в счётчики и строим сбалансированное дерево
+        unique: List[int] = []
+        counts: List[int] = []
+        for key, group in groupby(keys):
+            if unique and key < unique[-1]:
+                raise ValueError("Keys must be sorted")
+            if check_keys:
+                self._check_key(key)
+            unique.append(key)
+            counts.append(sum(1 for _ in group))
+        return self._build(unique, counts, 0, len(unique))
+
+    def _build(self, keys: List[int], counts: List[int], lo: int, hi: int) -> Optional[AVLNode]:
+        # Середина отрезка становится корнем, поэтому размеры поддеревьев отличаются не более чем на 1
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        node = self._node_type(keys[mid], self._owner)
+        node.count = counts[mid]
+        node.left = self._build(keys, counts, lo, mid)
+        node.right = self._build(keys, counts, mid + 1, hi)
+        self._update(node)
+        return node
+
+    def _check_key(self, key: int) -> None:
+        if key <= 0:
+            raise ValueError("Key must be greater than 0")
+
+    def _own(self, node: AVLNode) -> AVLNode:
+        # Узлы, общие с другими версиями дерева, не изменяются на месте, а копируются
+        return node if node.owner is self._owner else self._clone(node)
+
+    def _detach(self) -> None:
+        # Все текущие узлы становятся общими: последующие изменения скопируют затронутые пути
+        self._owner = object()
+
+    def _begin_write(self) -> None:
+        self._flat_cache = None
+        if self.persistent:
+            self._detach()
+
+    def _empty(self) -> 'AVLTree':
+        # Пустое дерево того же класса с теми же настройками
+        return type(self)(self.persistent, self.aggregate)
+
+    def _check_compatible(self, other: 'AVLTree') -> None:
+        # Узлы деревьев смешиваются, поэтому агрегаты в них должны считаться одинаково
+        if self.aggregate is not other.aggregate:
+            raise ValueError("Trees must use the same aggregate")
 
     def _height(self, node: Optional[AVLNode]) -> int:
         return node.height if node else 0
@@ -27,15 +164,40 @@ class AVLTree:
     
     def _update(self, node: Optional[AVLNode]) -> None:
         if node:
-            # Рекурсивно обновляем высоту
-            node.height = max(self._height(node.left), self._height(node.right)) + 1 
-            # Рекурсивно обновляем количество элементов в поддереве
-            node.size = self._size(node.left) + self._size(node.right) + 1 
+            # Горячий путь всех операций -- поля потомков читаем напрямую, без _height/_size
+            left, right = node.left, node.right
+            if left:
+                if right:
+                    node.height = (left.height if left.height > right.height else right.height) + 1
+                    node.size = left.size + left.count + right.size + right.count - 1
+                else:
+                    node.height = left.height + 1
+                    node.size = left.size + left.count
+            elif right:
+                node.height = right.height + 1
+                node.size = right.size + right.count
+            else:
+                node.height = 1
+                node.size = 1
+
+    def _update_aggregate(self, node: Optional[AVLNode]) -> None:
+        # _update для дерева с агрегатом: дополнительно пересчитывает агрегат поддерева
+        if node:
+            AVLTree._update(self, node)
+            monoid = self.aggregate
+            value = monoid.lift(node.key, node.count)
+            if node.left:
+                value = monoid.combine(node.left.agg, value)
+            if node.right:
+                value = monoid.combine(value, node.right.agg)
+            node.agg = value
             
     def _rotate_right(self, y: AVLNode) -> AVLNode:
         x = y.left
         if not x:
             return y
+        y = self._own(y)
+        x = self._own(x)
         T2 = x.right
         x.right = y
         y.left = T2
@@ -47,6 +209,8 @@ class AVLTree:
         y = x.right
         if not y:
             return x
+        x = self._own(x)
+        y = self._own(y)
         T2 = y.left
         y.left = x
         x.right = T2
@@ -69,13 +233,60 @@ class AVLTree:
             return self._rotate_left(node)
         return node
 
+    def _rebuild_path(self, path: List[Tuple[AVLNode, bool]], node: Optional[AVLNode], delta: int) -> Optional[AVLNode]:
+        # Подвешивает node на место последнего шага пути и балансирует узлы пути снизу вверх.
+        # delta -- изменение количества элементов в поддереве под путём
+        for i in range(len(path) - 1, -1, -1):
+            original, went_left = path[i]
+            parent = self._own(original)
+            if went_left:
+                parent.left = node
+            else:
+                parent.right = node
+            height = parent.height
+            node = self._balance(parent)
+            if node is original and node.height == height and self.aggregate is None:
+                # Выше по пути высоты не меняются и узлы не копировались -- достаточно поправить размеры
+                for ancestor, _ in path[:i]:
+                    ancestor.size += delta
+                return path[0][0] if i else node
+        return node
+
+    def _descend(self, node: Optional[AVLNode], key: int) -> Tuple[List[Tuple[AVLNode, bool]], Optional[AVLNode]]:
+        # Спуск от node к key: путь из пар (узел, шаг влево) и узел с ключом key (None, если ключа нет)
+        path: List[Tuple[AVLNode, bool]] = []
+        while node and key != node.key:
+            went_left = key < node.key
+            path.append((node, went_left))
+            node = node.left if went_left else node.right
+        return path, node
+
+    def _find(self, node: Optional[AVLNode], key: int) -> Optional[AVLNode]:
+        # Спуск без запоминания пути (для поиска)
+        while node:
+            if key == node.key:
+                return node
+            node = node.left if key < node.key else node.right
+        return None
+
     def _insert(self, node: Optional[AVLNode], key: int) -> AVLNode:
+        path, node = self._descend(node, key)
+        if node:
+            node = self._own(node)
+            node.count += 1 # Увеличиваем количество дубликатов
+        else:
+            node = self._node_type(key, self._owner)
+        self._update(node)
+        return self._rebuild_path(path, node, 1)
+
+    # Рекурсивная реализация, оставлена как эталон для тестов
+    def _insert_recursive(self, node: Optional[AVLNode], key: int) -> AVLNode:
         if not node:
             return AVLNode(key)
         if key < node.key:
-            node.left = self._insert(node.left, key)
+            node.left = self._insert_recursive(node.left, key)
         elif key > node.key:
-            node.right = self._insert(node.right, key)
+            node.right = self._insert_recursive(node.right, key)
         else:
             node.count += 1 # Увеличиваем количество дубликатов
             return node
@@ -83,8 +294,8 @@ class AVLTree:
 
     def insert(self, key: int) -> None:
         """Вставка ключа в дерево"""
-        if key <= 0:
-            raise ValueError("Key must be greater than 0")
+        self._check_key(key)
+        self._begin_write()
         self.root = self._insert(self.root, key)
 
     def _find_min(self, node: AVLNode) -> AVLNode:
@@ -93,12 +304,42 @@ class AVLTree:
         return node
 
     def _remove(self, node: Optional[AVLNode], key: int) -> Optional[AVLNode]:
+        root = node
+        path, node = self._descend(node, key)
+        if not node:
+            return root
+        if node.count > 1:
+            node = self._own(node)
+            node.count -= 1 # Если есть дубликаты, уменьшаем количество
+            self._update(node)
+            replacement = node
+        elif not node.left:
+            replacement = node.right
+        elif not node.right:
+            replacement = node.left
+        else:
+            # Если у узла два потомка, переносим в него минимальный элемент правого поддерева
+            # и вырезаем узел этого элемента (поддеревья на пути к нему теряют все его дубликаты)
+            node = self._own(node)
+            successor_path: List[Tuple[AVLNode, bool]] = []
+            successor = node.right
+            while successor.left:
+                successor_path.append((successor, True))
+                successor = successor.left
+            node.key = successor.key
+            node.count = successor.count
+            node.right = self._rebuild_path(successor_path, successor.right, -successor.count)
+            replacement = self._balance(node)
+        return self._rebuild_path(path, replacement, -1)
+
+    # Рекурсивная реализация, оставлена как эталон для тестов
+    def _remove_recursive(self, node: Optional[AVLNode], key: int) -> Optional[AVLNode]:
         if not node:
             return None
         if key < node.key:
-            node.left = self._remove(node.left, key)
+            node.left = self._remove_recursive(node.left, key)
         elif key > node.key:
-            node.right = self._remove(node.right, key)
+            node.right = self._remove_recursive(node.right, key)
         else:
             if node.count > 1:
                 node.count -= 1 # Если есть дубликаты, уменьшаем количество
@@ -114,30 +355,245 @@ class AVLTree:
             node.key = temp.key
             node.count = temp.count
             temp.count = 1 
-            node.right = self._remove(node.right, temp.key)
+            node.right = self._remove_recursive(node.right, temp.key)
         return self._balance(node)
 
     def remove(self, key: int) -> None:
         """Удаление ключа из дерева"""
+        self._begin_write()
         self.root = self._remove(self.root, key)
 
     def search(self, key: int) -> bool:
         """Поиск ключа в дереве"""
+        return self._find(self.root, key) is not None
+
+    def floor(self, key: int) -> Optional[int]:
+        """Наибольший ключ дерева, не превосходящий key (None, если такого нет)"""
+        result = None
         node = self.root
         while node:
-            if key == node.key:
-                return True
-            node = node.left if key < node.key else node.right
-        return False
+            if key < node.key:
+                node = node.left
+            else:
+                result = node.key
+                if key == node.key:
+                    break
+                node = node.right
+        return result
+
+    def ceiling(self, key: int) -> Optional[int]:
+        """Наименьший ключ дерева, не меньший key (None, если такого нет)"""
+        result = None
+        node = self.root
+        while node:
+            if node.key < key:
+                node = node.right
+            else:
+                result = node.key
+                if key == node.key:
+                    break
+                node = node.left
+        return result
+
+    def _rank(self, key: int, inclusive: bool) -> int:
+        # Количество элементов, меньших key (или меньших либо равных при inclusive)
+        result = 0
+        node = self.root
+        while node:
+            if key < node.key:
+                node = node.left
+            elif key > node.key:
+                result += self._size(node.left) + node.count
+                node = node.right
+            else:
+                return result + self._size(node.left) + (node.count if inclusive else 0)
+        return result
+
+    def rank(self, key: int) -> int:
+        """Количество элементов дерева, меньших key"""
+        return self._rank(key, False)
+
+    def select(self, k: int) -> int:
+        """k-й по возрастанию элемент дерева (нумерация с 0, с учётом дубликатов)"""
+        if k < 0:
+            k += self.size()
+        if not 0 <= k < self.size():
+            raise IndexError("Index out of range")
+        node = self.root
+        while node:
+            left_size = self._size(node.left)
+            if k < left_size:
+                node = node.left
+            elif k < left_size + node.count:
+                return node.key
+            else:
+                k -= left_size + node.count
+                node = node.right
+        raise IndexError("Index out of range")
+
+    def count_range(self, lo: int, hi: int) -> int:
+        """Количество элементов дерева в отрезке [lo, hi]"""
+        if lo > hi:
+            return 0
+        return self._rank(hi, True) - self._rank(lo, False)
+
+    def percentile(self, q: float) -> int:
+        """q-й процентиль (0 <= q <= 100) по методу ближайшего ранга"""
+        if not 0 <= q <= 100:
+            raise ValueError("Percentile must be in range [0, 100]")
+        if not self.root:
+            raise ValueError("The AVL tree is empty")
+        n = self.size()
+        # Ближайший ранг: наименьший элемент, не меньше которого q% элементов
+        k = -(-q * n // 100)
+        return self.select(max(int(k), 1) - 1)
+
+    def median(self) -> int:
+        """Медиана дерева (для чётного количества элементов -- нижняя)"""
+        return self.percentile(50)
+
+    def _aggregate_from(self, node: Optional[AVLNode], lo: int) -> Any:
+        # Агрегат ключей поддерева, больших или равных lo; части собираются справа налево
+        monoid = self.aggregate
+        result = monoid.identity
+        while node:
+            if node.key >= lo:
+                value = monoid.lift(node.key, node.count)
+                if node.right:
+                    value = monoid.combine(value, node.right.agg)
+                result = monoid.combine(value, result)
+                node = node.left
+            else:
+                node = node.right
+        return result
+
+    def _aggregate_upto(self, node: Optional[AVLNode], hi: int) -> Any:
+        # Агрегат ключей поддерева, меньших или равных hi; части собираются слева направо
+        monoid = self.aggregate
+        result = monoid.identity
+        while node:
+            if node.key <= hi:
+                value = monoid.lift(node.key, node.count)
+                if node.left:
+                    value = monoid.combine(node.left.agg, value)
+                result = monoid.combine(result, value)
+                node = node.right
+            else:
+                node = node.left
+        return result
+
+    def range_aggregate(self, lo: int, hi: int) -> Any:
+        """Агрегат ключей из отрезка [lo, hi] за O(log n); для пустого отрезка -- нейтральный элемент"""
+        monoid = self.aggregate
+        if monoid is None:
+            raise ValueError("The AVL tree has no aggregate")
+        # Спускаемся до первого узла внутри отрезка: ключи отрезка лежат в его поддереве
+        node = self.root
+        while node and not lo <= node.key <= hi:
+            node = node.left if hi < node.key else node.right
+        if not node:
+            return monoid.identity
+        value = monoid.lift(node.key, node.count)
+        return monoid.combine(monoid.combine(self._aggregate_from(node.left, lo), value), self._aggregate_upto(node.right, hi))
+
+    def _flat(self) -> Dict[str, Any]:
+        # Плоское представление дерева: отсортированные различные ключи "keys" и префиксные суммы количеств
+        # "prefix" (prefix[i] -- число элементов с ключами меньше keys[i]). Производные структуры (словарь
+        # количеств, массивы numpy) достраиваются по требованию. Кэш сбрасывается записью и заменой корня
+        # Корень читается до кэша: в BufferedAVLTree чтение корня сбрасывает буфер и вместе с ним кэш
+        root = self.root
+        cache = self._flat_cache
+        if cache is None or cache["root"] is not root:
+            keys: List[int] = []
+            prefix = [0]
+            for node in self._iter_nodes():
+                keys.append(node.key)
+                prefix.append(prefix[-1] + node.count)
+            cache = self._flat_cache = {"root": root, "keys": keys, "prefix": prefix}
+        return cache
+
+    def _flat_counts(self) -> Dict[int, int]:
+        cache = self._flat()
+        if "counts" not in cache:
+            prefix = cache["prefix"]
+            cache["counts"] = {key: prefix[i + 1] - prefix[i] for i, key in enumerate(cache["keys"])}
+        return cache["counts"]
+
+    def _flat_arrays(self) -> Tuple[Any, Any]:
+        cache = self._flat()
+        if "arrays" not in cache:
+            cache["arrays"] = np.asarray(cache["keys"]), np.asarray(cache["prefix"])
+        return cache["arrays"]
+
+    def search_many(self, keys: Iterable[int]) -> Union[List[bool], Any]:
+        """Пакетный поиск ключей; для массива numpy ответ -- массив numpy"""
+        if np is not None and isinstance(keys, np.ndarray):
+            flat, prefix = self._flat_arrays()
+            return prefix[np.searchsorted(flat, keys, "right")] > prefix[np.searchsorted(flat, keys, "left")]
+        counts = self._flat_counts()
+        return [key in counts for key in keys]
+
+    def rank_many(self, keys: Iterable[int]) -> Union[List[int], Any]:
+        """Пакетный rank: количество элементов, меньших каждого ключа"""
+        if np is not None and isinstance(keys, np.ndarray):
+            flat, prefix = self._flat_arrays()
+            return prefix[np.searchsorted(flat, keys, "left")]
+        cache = self._flat()
+        flat, prefix = cache["keys"], cache["prefix"]
+        return [prefix[bisect_left(flat, key)] for key in keys]
+
+    def count_many(self, keys: Iterable[int]) -> Union[List[int], Any]:
+        """Пакетный подсчёт количества вхождений каждого ключа"""
+        if np is not None and isinstance(keys, np.ndarray):
+            flat, prefix = self._flat_arrays()
+            return prefix[np.searchsorted(flat, keys, "right")] - prefix[np.searchsorted(flat, keys, "left")]
+        counts = self._flat_counts()
+        return [counts.get(key, 0) for key in keys]
 
     def _traverse(self, node: Optional[AVLNode], result: List[int], order: str) -> None:
+        stack: List[AVLNode] = []
+        if order == "preorder":
+            if node:
+                stack.append(node)
+            while stack:
+                node = stack.pop()
+                result += [node.key] * (node.count)
+                if node.right:
+                    stack.append(node.right)
+                if node.left:
+                    stack.append(node.left)
+        elif order == "inorder":
+            while stack or node:
+                while node:
+                    stack.append(node)
+                    node = node.left
+                node = stack.pop()
+                result += [node.key] * (node.count)
+                node = node.right
+        elif order == "postorder":
+            # Обход в порядке (корень, правое, левое), развёрнутый задом наперёд
+            nodes: List[AVLNode] = []
+            if node:
+                stack.append(node)
+            while stack:
+                node = stack.pop()
+                nodes.append(node)
+                if node.left:
+                    stack.append(node.left)
+                if node.right:
+                    stack.append(node.right)
+            for node in reversed(nodes):
+                result += [node.key] * (node.count)
+
+    # Рекурсивная реализация, оставлена как эталон для тестов
+    def _traverse_recursive(self, node: Optional[AVLNode], result: List[int], order: str) -> None:
         if node:
             if order == "preorder":
                 result += [node.key] * (node.count)
-            self._traverse(node.left, result, order)
+            self._traverse_recursive(node.left, result, order)
             if order == "inorder":
                 result += [node.key] * (node.count)
-            self._traverse(node.right, result, order)
+            self._traverse_recursive(node.right, result, order)
             if order == "postorder":
                 result += [node.key] * (node.count)
 
@@ -147,7 +603,76 @@ class AVLTree:
         self._traverse(self.root, result, order)
         return result
     
-    def _validate_avl(self, node: Optional[AVLNode], min_key=float('-inf'), max_key=float('inf')) -> bool:
+    def _iter_nodes(self, start: Optional[int] = None, inclusive: bool = True, reverse: bool = False) -> Iterator[AVLNode]:
+        # Ленивый симметричный обход с явным стеком, начиная с первого узла не раньше start
+        # (при reverse -- в порядке убывания, начиная с первого узла не позже start)
+        stack: List[AVLNode] = []
+        node = self.root
+        while node:
+            if start is None or (node.key == start and inclusive) or (node.key < start if reverse else node.key > start):
+                stack.append(node)
+                node = node.right if reverse else node.left
+            else:
+                node = node.left if reverse else node.right
+        while stack:
+            node = stack.pop()
+            yield node
+            node = node.left if reverse else node.right
+            while node:
+                stack.append(node)
+                node = node.right if reverse else node.left
+
+    def _iter_keys(self, nodes: Iterable[AVLNode], with_counts: bool) -> Iterator[Union[int, Tuple[int, int]]]:
+        for node in nodes:
+            if with_counts:
+                yield node.key, node.count
+            else:
+                yield from repeat(node.key, node.count)
+
+    def __iter__(self) -> Iterator[int]:
+        return self._iter_keys(self._iter_nodes(), False)
+
+    def __reversed__(self) -> Iterator[int]:
+        return self._iter_keys(self._iter_nodes(reverse=True), False)
+
+    def __contains__(self, key: int) -> bool:
+        return self.search(key)
+
+    def iter_range(self, lo: int, hi: int, inclusive: Tuple[bool, bool] = (True, True), with_counts: bool = False) -> Iterator[Union[int, Tuple[int, int]]]:
+        """Ленивый обход ключей из диапазона [lo, hi] по возрастанию; inclusive задаёт включение границ, with_counts -- выдачу пар (ключ, количество)"""
+        def nodes() -> Iterator[AVLNode]:
+            for node in self._iter_nodes(lo, inclusive[0]):
+                if node.key > hi or (node.key == hi and not inclusive[1]):
+                    return
+                yield node
+        return self._iter_keys(nodes(), with_counts)
+
+    def iter_from(self, key: int, with_counts: bool = False) -> Iterator[Union[int, Tuple[int, int]]]:
+        """Ленивый обход ключей, больших или равных key, по возрастанию"""
+        return self._iter_keys(self._iter_nodes(key), with_counts)
+
+    def _validate_avl(self, node: Optional[AVLNode], min_key: Optional[int] = None, max_key: Optional[int] = None) -> bool:
+        # Пустое поддерево является AVL; None -- отсутствие границы (ключи не обязаны быть числами)
+        stack = [(node, min_key, max_key)] if node else []
+        while stack:
+            node, min_key, max_key = stack.pop()
+            if (min_key is not None and not min_key < node.key) or (max_key is not None and not node.key < max_key):
+                # Нарушение свойства BST
+                return False
+            if abs(self._balance_factor(node)) > 1:
+                # Нарушение балансировки AVL
+                return False
+            if node.size != (self._size(node.left) + self._size(node.right) + 1):
+                # Нарушение свойства size в данной реализации AVL
+                return False
+            if node.left:
+                stack.append((node.left, min_key, node.key))
+            if node.right:
+                stack.append((node.right, node.key, max_key))
+        return True
+
+    # Рекурсивная реализация, оставлена как эталон для тестов
+    def _validate_avl_recursive(self, node: Optional[AVLNode], min_key=float('-inf'), max_key=float('inf')) -> bool:
         if not node:
             # Пустое поддерево является AVL
             return True 
@@ -164,48 +689,254 @@ class AVLTree:
             # Нарушение свойства size в данной реализации AVL
             # print(f"Node key {node.key} has invalid size")
             return False 
-        return self._validate_avl(node.left, min_key, node.key) and self._validate_avl(node.right, node.key, max_key)
-        
+        return self._validate_avl_recursive(node.left, min_key, node.key) and self._validate_avl_recursive(node.right, node.key, max_key)
+
     def validate_avl(self) -> bool:
         """Проверка на то, что дерево является AVL"""
         return self._validate_avl(self.root)
 
+    def _join(self, left: Optional[AVLNode], pivot: AVLNode, right: Optional[AVLNode]) -> AVLNode:
+        # Все ключи left меньше pivot.key, все ключи right -- больше.
+        # Спускаемся по краю более высокого дерева до поддерева сопоставимой высоты,
+        # подвешиваем туда pivot и балансируем обратно вверх: O(|h(left) - h(right)|)
+        left_height, right_height = self._height(left), self._height(right)
+        if left_height > right_height + 1:
+            left = self._own(left)
+            left.right = self._join(left.right, pivot, right)
+            return self._balance(left)
+        if right_height > left_height + 1:
+            right = self._own(right)
+            right.left = self._join(left, pivot, right.left)
+            return self._balance(right)
+        pivot = self._own(pivot)
+        pivot.left, pivot.right = left, right
+        self._update(pivot)
+        return pivot
+
+    def _pop_min(self, node: AVLNode) -> Tuple[Optional[AVLNode], AVLNode]:
+        # Отделяет узел с минимальным ключом, возвращает (оставшееся поддерево, минимальный узел)
+        node = self._own(node)
+        if not node.left:
+            rest, node.right = node.right, None
+            return rest, node
+        node.left, min_node = self._pop_min(node.left)
+        return self._balance(node), min_node
+
+    def _concat(self, left: Optional[AVLNode], right: Optional[AVLNode]) -> Optional[AVLNode]:
+        # Соединение двух деревьев, где все ключи left меньше всех ключей right
+        if not left:
+            return right
+        if not right:
+            return left
+        right, pivot = self._pop_min(right)
+        return self._join(left, pivot, right)
+
     def _split(self, node: Optional[AVLNode], key: int) -> Tuple[Optional[AVLNode], Optional[AVLNode]]:
+        # Спускаемся к месту key, затем снизу вверх присоединяем каждый узел пути
+        # вместе с его поддеревьем к левой или правой части
+        # Элементы, меньшие или равные key, попадают в левое поддерево; остальные -- в правое
+        path: List[AVLNode] = []
+        while node:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        left: Optional[AVLNode] = None
+        right: Optional[AVLNode] = None
+        for node in reversed(path):
+            if key < node.key:
+                right = self._join(right, node, node.right)
+            else:
+                left = self._join(node.left, node, left)
+        return left, right
+
+    # Рекурсивная реализация, оставлена как эталон для тестов
+    def _split_recursive(self, node: Optional[AVLNode], key: int) -> Tuple[Optional[AVLNode], Optional[AVLNode]]:
         if not node:
             return None, None
-        # Рекурсивно разделяем левое и правое поддеревья 
+        # Рекурсивно разделяем одно из поддеревьев и присоединяем к его части узел с другим поддеревом
         # Элементы, меньшие или равные key, попадают в левое поддерево; остальные -- в правое
         if key < node.key:
-            left, node.left = self._split(node.left, key)
-            node = self._balance(node)
-            return left, node
+            left, right = self._split_recursive(node.left, key)
+            return left, self._join(right, node, node.right)
         else:
-            node.right, right = self._split(node.right, key)
-            node = self._balance(node)
-            return node, right
+            left, right = self._split_recursive(node.right, key)
+            return self._join(node.left, node, left), right
+
+    def _split3(self, node: Optional[AVLNode], key: int) -> Tuple[Optional[AVLNode], Optional[AVLNode], Optional[AVLNode]]:
+        # Разделение на ключи < key, отдельный узел с ключом key (если есть) и ключи > key
+        path: List[AVLNode] = []
+        while node and key != node.key:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        left: Optional[AVLNode] = None
+        right: Optional[AVLNode] = None
+        mid = node
+        if mid:
+            mid = self._own(mid)
+            left, right = mid.left, mid.right
+            mid.left = mid.right = None
+            self._update(mid)
+        for node in reversed(path):
+            if key < node.key:
+                right = self._join(right, node, node.right)
+            else:
+                left = self._join(node.left, node, left)
+        return left, mid, right
+
+    def _combine(self, node: Optional[AVLNode], other: Optional[AVLNode], count: Callable[[int, int], int]) -> Optional[AVLNode]:
+        # Общая схема операций над мультимножествами: node разрезается по корню other, части обрабатываются
+        # рекурсивно и соединяются через корень other -- O(m log(n/m + 1)) для m = |other| <= n = |node|.
+        # count(a, b) -- итоговое количество ключа с количествами a в node и b в other (0 -- ключ выбрасывается);
+        # ключи, которые есть только в одном дереве, либо сохраняются с прежним количеством, либо выбрасываются
+        if not node:
+            return other if other and count(0, 1) else None
+        if not other:
+            return node if count(1, 0) else None
+        other_left, other_right = other.left, other.right
+        left, mid, right = self._split3(node, other.key)
+        left = self._combine(left, other_left, count)
+        right = self._combine(right, other_right, count)
+        result = count(mid.count if mid else 0, other.count)
+        if result > 0:
+            other = self._own(other)
+            other.count = result
+            return self._join(left, other, right)
+        return self._concat(left, right)
+
+    def _combine_roots(self, node: Optional[AVLNode], other: Optional[AVLNode], count: Callable[[int, int], int]) -> Optional[AVLNode]:
+        # Разрезается большее дерево, а по меньшему идёт рекурсия
+        if self._size(node) < self._size(other):
+            return self._combine(other, node, lambda a, b: count(b, a))
+        return self._combine(node, other, count)
+
+    def _union(self, node: Optional[AVLNode], other: Optional[AVLNode]) -> Optional[AVLNode]:
+        # Объединение со сложением счётчиков; узлы other переиспользуются
+        return self._combine(node, other, operator.add)
+
+    def _difference(self, node: Optional[AVLNode], other: Optional[AVLNode]) -> Optional[AVLNode]:
+        # Вычитание счётчиков other из node
+        return self._combine(node, other, _subtract_counts)
+
+    def _set_operation(self, other: 'AVLTree', count: Callable[[int, int], int], workers: Optional[int]) -> 'AVLTree':
+        # Результат строится в новом дереве, которое копирует изменяемые узлы, поэтому исходные деревья не меняются
+        self._check_compatible(other)
+        result = self._empty()
+        # Процессов не больше, чем доступных процессоров, а диапазонов -- чем различных ключей;
+        # небольшие деревья обрабатываются последовательно
+        workers = min(workers or 1, _available_cpus())
+        if (workers > 1 and self.size() + other.size() >= self.parallel_threshold
+                and max(len(self._flat()["keys"]), len(other._flat()["keys"])) >= workers):
+            result.root = result._combine_parallel(self, other, count, workers)
+            return result
+        self._detach()
+        other._detach()
+        result.root = result._combine_roots(self.root, other.root, count)
+        return result
+
+    def _combine_parallel(self, tree: 'AVLTree', other: 'AVLTree', count: Callable[[int, int], int], workers: int) -> Optional[AVLNode]:
+        # Оба дерева режутся на workers диапазонов ключей по квантилям большего из них; диапазоны не пересекаются,
+        # поэтому обрабатываются независимо в отдельных процессах, а результаты склеиваются построением за O(n)
+        flat, other_flat = tree._flat(), other._flat()
+        larger = max(flat["keys"], other_flat["keys"], key=len)
+        bounds = [larger[len(larger) * i // workers] for i in range(1, workers)]
+        chunks = []
+        for lo, hi in zip([None] + bounds, bounds + [None]):
+            chunks.append((*_flat_chunk(flat, lo, hi), *_flat_chunk(other_flat, lo, hi), count))
+        keys: List[int] = []
+        counts: List[int] = []
+        with ProcessPoolExecutor(workers) as pool:
+            for chunk_keys, chunk_counts in pool.map(_combine_chunk, chunks):
+                keys += chunk_keys
+                counts += chunk_counts
+        return self._build(keys, counts, 0, len(keys))
+
+    def union(self, other: 'AVLTree', workers: Optional[int] = None) -> 'AVLTree':
+        """Объединение мультимножеств (количество ключа -- максимум из двух деревьев); workers -- число процессов"""
+        return self._set_operation(other, max, workers)
+
+    def intersection(self, other: 'AVLTree', workers: Optional[int] = None) -> 'AVLTree':
+        """Пересечение мультимножеств (количество ключа -- минимум из двух деревьев)"""
+        return self._set_operation(other, min, workers)
+
+    def difference(self, other: 'AVLTree', workers: Optional[int] = None) -> 'AVLTree':
+        """Разность мультимножеств (количество ключа уменьшается на количество в other)"""
+        return self._set_operation(other, _subtract_counts, workers)
+
+    def symmetric_difference(self, other: 'AVLTree', workers: Optional[int] = None) -> 'AVLTree':
+        """Симметрическая разность мультимножеств (количество ключа -- модуль разности количеств)"""
+        return self._set_operation(other, _count_distance, workers)
+
+    def insert_many(self, keys: Iterable[int]) -> None:
+        """Пакетная вставка ключей за O(m log(n/m + 1))"""
+        self._begin_write()
+        self.root = self._union(self.root, self._build_sorted(sorted(keys)))
+
+    def remove_many(self, keys: Iterable[int]) -> None:
+        """Пакетное удаление ключей (каждое вхождение ключа в keys удаляет один дубликат) за O(m log(n/m + 1))"""
+        self._begin_write()
+        self.root = self._difference(self.root, self._build_sorted(sorted(keys), check_keys=False))
 
     def split(self, key: int) -> Tuple['AVLTree', 'AVLTree']:
-        """Разделение дерева на два по ключу; левое дерево содержит все ключи <= key, правое -- > key"""
+        """Разделение дерева на два по ключу; левое дерево содержит все ключи <= key, правое -- > key
+        (исходное дерево становится пустым, а в персистентном режиме остаётся неизменным)"""
+        self._begin_write()
         left, right = self._split(self.root, key)
-        left_tree, right_tree = AVLTree(), AVLTree()
+        left_tree, right_tree = self._empty(), self._empty()
         left_tree.root, right_tree.root = left, right
-        left_tree._rebalance_tree()
-        right_tree._rebalance_tree()
+        # Токен исходного дерева владеет узлами обеих половин, поэтому половины получают собственные токены
+        # (из _empty): путь разделения скопируется при первой записи, а снимки одной половины не изменятся через другую
+        if not self.persistent:
+            self.root = None
+        self._detach()
         return left_tree, right_tree
 
-    def _rebalance_tree(self):  
-        def _rebalance(node: Optional[AVLNode]) -> Optional[AVLNode]:
-            if not node:
-                return None
-            node.left = _rebalance(node.left)
-            node.right = _rebalance(node.right)
-            return self._balance(node)
-        self.root = _rebalance(self.root)
+    def remove_range(self, lo: int, hi: int) -> 'AVLTree':
+        """Удаление всех ключей отрезка [lo, hi] за O(log n); возвращает дерево из удалённых ключей"""
+        removed = self._empty()
+        if lo > hi:
+            return removed
+        self._begin_write()
+        left, mid, rest = self._split3(self.root, lo)
+        inner, right = self._split(rest, hi)
+        if mid:
+            inner = self._join(None, mid, inner)
+        self.root = self._concat(left, right)
+        # Токен дерева владеет и удалёнными узлами, поэтому оба дерева получают новые токены:
+        # иначе одно из них могло бы изменить на месте узлы снимков другого (например, при merge)
+        removed.root = inner
+        self._detach()
+        return removed
+
+    @classmethod
+    def join(cls, left: 'AVLTree', key: int, right: 'AVLTree') -> 'AVLTree':
+        """Соединение деревьев через ключ key; все ключи left должны быть меньше key, все ключи right -- больше"""
+        left._check_compatible(right)
+        tree = cls(aggregate=left.aggregate)
+        tree._check_key(key)
+        if (left.root and left.max() >= key) or (right.root and right.min() <= key):
+            raise ValueError("Keys of left must be less than key and keys of right must be greater than key")
+        tree.root = tree._join(left.root, tree._node_type(key, tree._owner), right.root)
+        left.root = right.root = None
+        return tree
 
     def merge(self, other: 'AVLTree') -> None:
-        """Слияние двух AVL-деревьев"""
-        for key in other.traverse():
-            self.insert(key)
+        """Слияние двух AVL-деревьев; узлы other становятся общими для обоих деревьев, other не изменяется"""
+        self._check_compatible(other)
+        self._begin_write()
+        # Узлы other становятся общими для обоих деревьев и далее не изменяются на месте
+        other._detach()
+        if not other.root:
+            return
+        if not self.root:
+            self.root = other.root
+        elif self.max() < other.min():
+            self.root = self._concat(self.root, other.root)
+        elif other.max() < self.min():
+            self.root = self._concat(other.root, self.root)
+        elif self.size() >= other.size():
+            # Диапазоны ключей пересекаются -- объединяем, разрезая большее дерево по меньшему
+            self.root = self._union(self.root, other.root)
+        else:
+            self.root = self._union(other.root, self.root)
     
     def height(self) -> int:
         """Высота дерева"""
@@ -236,18 +967,378 @@ class AVLTree:
             node = node.left
         return node.key
     
+    def enable_stats(self, hook: Optional[Callable[[str, int], None]] = None) -> None:
+        """Включение счётчиков поворотов и глубины спуска; hook(событие, значение) получает каждое событие"""
+        self._stats = {"rotate_left": 0, "rotate_right": 0}
+        self._depths: Counter = Counter()
+        self._stats_hook = hook
+        # Обёртки ставятся атрибутами экземпляра: пока статистика выключена, вызываются методы класса без накладных расходов
+        for name in ("_rotate_left", "_rotate_right"):
+            self.__dict__[name] = self._counted(name.lstrip("_"), getattr(type(self), name).__get__(self))
+        # Глубина считается в самом спуске операции, а не отдельным проходом
+        self.__dict__["_descend"] = self._measured_descend
+        self.__dict__["_find"] = self._measured_find
+
+    def disable_stats(self) -> None:
+        """Отключение счётчиков и сброс накопленной статистики"""
+        for name in ("_rotate_left", "_rotate_right", "_descend", "_find"):
+            self.__dict__.pop(name, None)
+        self._stats = None
+
+    def _counted(self, event: str, rotate: Callable[[AVLNode], AVLNode]) -> Callable[[AVLNode], AVLNode]:
+        def wrapper(node: AVLNode) -> AVLNode:
+            self._stats[event] += 1
+            if self._stats_hook:
+                self._stats_hook(event, 1)
+            return rotate(node)
+        return wrapper
+
+    def _record_descent(self, depth: int) -> None:
+        # depth -- количество узлов, которые посетил спуск
+        self._depths[depth] += 1
+        if self._stats_hook:
+            self._stats_hook("descent", depth)
+
+    def _measured_descend(self, node: Optional[AVLNode], key: int) -> Tuple[List[Tuple[AVLNode, bool]], Optional[AVLNode]]:
+        path, found = AVLTree._descend(self, node, key)
+        self._record_descent(len(path) + (found is not None))
+        return path, found
+
+    def _measured_find(self, node: Optional[AVLNode], key: int) -> Optional[AVLNode]:
+        depth = 0
+        while node:
+            depth += 1
+            if key == node.key:
+                break
+            node = node.left if key < node.key else node.right
+        self._record_descent(depth)
+        return node
+
+    def stats(self) -> Dict[str, Any]:
+        """Размер, высота и количество узлов дерева, а при включённой статистике -- счётчики поворотов и гистограмма глубины спуска"""
+        result: Dict[str, Any] = {"size": self.size(), "height": self.height(), "nodes": sum(1 for _ in self._iter_nodes())}
+        if self._stats is not None:
+            depths = self._depths
+            total = sum(depths.values())
+            result["rotations"] = dict(self._stats)
+            result["descent_depth"] = {
+                "histogram": dict(sorted(depths.items())),
+                "avg": sum(depth * count for depth, count in depths.items()) / total if total else 0.0,
+                "max": max(depths, default=0),
+            }
+        return result
+
+    def _clone(self, node: AVLNode) -> AVLNode:
+        new_node = self._node_type(node.key, self._owner)
+        new_node.left = node.left
+        new_node.right = node.right
+        new_node.height = node.height
+        new_node.size = node.size
+        new_node.count = node.count
+        if self.aggregate is not None:
+            new_node.agg = node.agg
+        return new_node
+
     def _copy(self, node: Optional[AVLNode]) -> Optional[AVLNode]:
         if not node:
             return None
-        new_node = AVLNode(node.key)
+        root = self._clone(node)
+        stack = [(node, root)]
+        while stack:
+            node, new_node = stack.pop()
+            if node.left:
+                new_node.left = self._clone(node.left)
+                stack.append((node.left, new_node.left))
+            if node.right:
+                new_node.right = self._clone(node.right)
+                stack.append((node.right, new_node.right))
+        return root
+
+    # Рекурсивная реализация, оставлена как эталон для тестов
+    def _copy_recursive(self, node: Optional[AVLNode]) -> Optional[AVLNode]:
+        if not node:
+            return None
+        new_node = self._node_type(node.key)
         new_node.height = node.height
         new_node.size = node.size
         new_node.count = node.count
-        new_node.left = self._copy(node.left)
-        new_node.right = self._copy(node.right)
+        if self.aggregate is not None:
+            new_node.agg = node.agg
+        new_node.left = self._copy_recursive(node.left)
+        new_node.right = self._copy_recursive(node.right)
         return new_node
         
+    def snapshot(self) -> 'AVLTree':
+        """Снимок дерева за O(1); снимок и исходное дерево далее изменяются независимо, копируя только затронутые пути"""
+        new_tree = self._empty()
+        new_tree.root = self.root
+        self._detach()
+        return new_tree
+
+    def save(self, path: str) -> None:
+        """Сохранение дерева в двоичный файл: отсортированные ключи и накопленные количества элементов (int64)"""
+        flat = self._flat()
+        keys = array('q', flat["keys"])
+        totals = array('q', flat["prefix"][1:])
+        if sys.byteorder == "big":
+            keys.byteswap()
+            totals.byteswap()
+        with open(path, "wb") as f:
+            f.write(_FILE_HEADER.pack(_FILE_MAGIC, _FILE_VERSION, len(keys)))
+            keys.tofile(f)
+            totals.tofile(f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False, aggregate: Optional[Monoid] = None) -> Union['AVLTree', 'FrozenAVLTree']:
+        """Загрузка дерева из файла save() за O(n); при mmap=True возвращается FrozenAVLTree поверх отображённого файла"""
+        if mmap:
+            return FrozenAVLTree(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        n = _read_header(data, len(data))
+        keys = array('q', data[_FILE_HEADER.size:_FILE_HEADER.size + 8 * n])
+        totals = array('q', data[_FILE_HEADER.size + 8 * n:])
+        if sys.byteorder == "big":
+            keys.byteswap()
+            totals.byteswap()
+        counts = [total - previous for previous, total in zip([0] + totals[:-1].tolist(), totals)]
+        tree = cls(aggregate=aggregate)
+        tree.root = tree._build(keys, counts, 0, n)
+        return tree
+
     def __copy__(self) -> 'AVLTree':
-        new_tree = AVLTree()
-        new_tree.root = self._copy(self.root)
+        return self.snapshot()
+
+    def __deepcopy__(self, memo: dict) -> 'AVLTree':
+        new_tree = self._empty()
+        new_tree.root = new_tree._copy(self.root)
         return new_tree
+
+class BufferedAVLTree(AVLTree):
+    # Режим, оптимизированный для записи: вставляемые ключи накапливаются в неупорядоченном буфере
+    # (словарь ключ -> количество) и при заполнении буфера сливаются в дерево пакетом через insert_many.
+    # Любое обращение к корню сначала сбрасывает буфер, поэтому все операции AVLTree видят актуальное дерево;
+    # search и size отвечают по буферу и дереву без сброса
+    # Если различных ключей в дереве не больше чем в rebuild_ratio раз больше, чем в буфере, дерево строится заново
+    rebuild_ratio = 4
+
+    def __init__(self, persistent: bool = False, aggregate: Optional[Monoid] = None, buffer_size: int = 4096) -> None:
+        if buffer_size < 1:
+            raise ValueError("Buffer size must be positive")
+        self.buffer_size = buffer_size
+        self._buffer: Dict[int, int] = {}
+        self._pending = 0 # Количество элементов в буфере с учётом дубликатов
+        self._root: Optional[AVLNode] = None
+        super().__init__(persistent, aggregate)
+
+    @property
+    def root(self) -> Optional[AVLNode]:
+        if self._pending:
+            self.flush()
+        return self._root
+
+    @root.setter
+    def root(self, node: Optional[AVLNode]) -> None:
+        self._root = node
+
+    def _empty(self) -> 'BufferedAVLTree':
+        return type(self)(self.persistent, self.aggregate, self.buffer_size)
+
+    def _detach(self) -> None:
+        # Буфер сбрасывается до смены токена, иначе узлы из буфера достались бы новому токену
+        # и изменялись бы на месте, хотя уже стали общими (например, с результатом union)
+        if self._pending:
+            self.flush()
+        super()._detach()
+
+    def flush(self) -> None:
+        """Слияние буфера с деревом"""
+        if not self._pending:
+            return
+        buffer = self._buffer
+        self._buffer = {}
+        self._pending = 0
+        self._begin_write()
+        root = self._root
+        keys = sorted(buffer)
+        if not root or keys[0] > self.max() or keys[-1] < self.min():
+            # Ключи буфера не пересекаются с деревом (типично для упорядоченной загрузки): соединение за O(log n)
+            run = self._build(keys, [buffer[key] for key in keys], 0, len(keys))
+            self._root = self._concat(root, run) if not root or keys[0] > root.key else self._concat(run, root)
+        elif root.size > self.rebuild_ratio * len(keys):
+            # Буфер мал относительно дерева: вставляем ключи по возрастанию. Объединение split/join
+            # асимптотически лучше, но в CPython для разреженного буфера примерно вдвое медленнее
+            for key in keys:
+                for _ in range(buffer[key]):
+                    root = self._insert(root, key)
+            self._root = root
+        else:
+            # Буфер сопоставим с деревом: линейное слияние и построение заново дешевле поузлового объединения
+            merged = {node.key: node.count for node in self._iter_nodes()}
+            for key in keys:
+                merged[key] = merged.get(key, 0) + buffer[key]
+            # Ключи дерева и новые ключи буфера добавлены по возрастанию, сортировка лишь сливает две серии
+            keys = sorted(merged)
+            self._root = self._build(keys, [merged[key] for key in keys], 0, len(keys))
+
+    def insert(self, key: int) -> None:
+        """Добавление ключа в буфер; при заполнении буфера он сливается с деревом"""
+        self._check_key(key)
+        self._buffer[key] = self._buffer.get(key, 0) + 1
+        self._pending += 1
+        if self._pending >= self.buffer_size:
+            self.flush()
+
+    def ingest(self, keys: Iterable[int]) -> int:
+        """Вставка ключей из итерируемого объекта или генератора; возвращает количество вставленных ключей"""
+        inserted = 0
+        check_key = self._check_key
+        buffer = self._buffer
+        for key in keys:
+            check_key(key)
+            buffer[key] = buffer.get(key, 0) + 1
+            inserted += 1
+            self._pending += 1
+            if self._pending >= self.buffer_size:
+                self.flush()
+                buffer = self._buffer
+        return inserted
+
+    async def aingest(self, keys: AsyncIterable[int]) -> int:
+        """Вставка ключей из асинхронного итератора; возвращает количество вставленных ключей"""
+        inserted = 0
+        async for key in keys:
+            self.insert(key)
+            inserted += 1
+        return inserted
+
+    def search(self, key: int) -> bool:
+        """Поиск ключа в буфере и в дереве (без сброса буфера)"""
+        return key in self._buffer or self._find(self._root, key) is not None
+
+    def size(self) -> int:
+        """Количество элементов в дереве и в буфере (без сброса буфера)"""
+        return self._size(self._root) + self._pending
+
+class FrozenAVLTree:
+    # Неизменяемое представление файла AVLTree.save(), отображённого в память: запросы выполняются
+    # двоичным поиском прямо по массивам файла, узлы дерева не создаются
+    def __init__(self, path: str) -> None:
+        if sys.byteorder != "little":
+            raise ValueError("Memory-mapped loading requires a little-endian platform")
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            n = _read_header(self._mmap[:_FILE_HEADER.size], len(self._mmap))
+        except ValueError:
+            self._mmap.close()
+            raise
+        self._view = memoryview(self._mmap)
+        start = _FILE_HEADER.size
+        self._keys = self._view[start:start + 8 * n].cast('q')
+        self._totals = self._view[start + 8 * n:].cast('q') # Количество элементов с ключами <= keys[i]
+
+    def close(self) -> None:
+        """Освобождение отображения файла"""
+        if self._mmap.closed:
+            return
+        self._keys.release()
+        self._totals.release()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self) -> 'FrozenAVLTree':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _count(self, i: int) -> int:
+        return self._totals[i] - (self._totals[i - 1] if i else 0)
+
+    def search(self, key: int) -> bool:
+        """Поиск ключа"""
+        i = bisect_left(self._keys, key)
+        return i < len(self._keys) and self._keys[i] == key
+
+    def __contains__(self, key: int) -> bool:
+        return self.search(key)
+
+    def size(self) -> int:
+        """Количество элементов"""
+        return self._totals[-1] if len(self._totals) else 0
+
+    def __len__(self) -> int:
+        return self.size()
+
+    def rank(self, key: int) -> int:
+        """Количество элементов, меньших key"""
+        i = bisect_left(self._keys, key)
+        return self._totals[i - 1] if i else 0
+
+    def select(self, k: int) -> int:
+        """k-й по возрастанию элемент (нумерация с 0, с учётом дубликатов)"""
+        if k < 0:
+            k += self.size()
+        if not 0 <= k < self.size():
+            raise IndexError("Index out of range")
+        return self._keys[bisect_right(self._totals, k)]
+
+    def count_range(self, lo: int, hi: int) -> int:
+        """Количество элементов в отрезке [lo, hi]"""
+        if lo > hi:
+            return 0
+        i = bisect_right(self._keys, hi)
+        return (self._totals[i - 1] if i else 0) - self.rank(lo)
+
+    def min(self) -> int:
+        """Минимальный ключ"""
+        if not len(self._keys):
+            raise ValueError("The AVL tree is empty")
+        return self._keys[0]
+
+    def max(self) -> int:
+        """Максимальный ключ"""
+        if not len(self._keys):
+            raise ValueError("The AVL tree is empty")
+        return self._keys[-1]
+
+    def __iter__(self) -> Iterator[int]:
+        for i, key in enumerate(self._keys):
+            yield from repeat(key, self._count(i))
+
+    def to_tree(self) -> AVLTree:
+        """Построение изменяемого AVLTree из отображённых данных за O(n)"""
+        tree = AVLTree()
+        tree.root = tree._build(self._keys, [self._count(i) for i in range(len(self._keys))], 0, len(self._keys))
+        return tree
+
+def _available_cpus() -> int:
+    # Процессоры, на которых может выполняться текущий процесс (с учётом привязки), а не все процессоры машины
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def _subtract_counts(a: int, b: int) -> int:
+    return max(a - b, 0)
+
+def _count_distance(a: int, b: int) -> int:
+    return abs(a - b)
+
+def _flat_chunk(flat: Dict[str, Any], lo: Optional[int], hi: Optional[int]) -> Tuple[List[int], List[int]]:
+    # Ключи плоского представления из диапазона [lo, hi) и их количества
+    keys, prefix = flat["keys"], flat["prefix"]
+    i = bisect_left(keys, lo) if lo is not None else 0
+    j = bisect_left(keys, hi) if hi is not None else len(keys)
+    return keys[i:j], [prefix[k + 1] - prefix[k] for k in range(i, j)]
+
+def _combine_chunk(chunk: tuple) -> Tuple[List[int], List[int]]:
+    # Выполняется в процессе-исполнителе: строит деревья диапазона и возвращает результат в плоском виде
+    keys, counts, other_keys, other_counts, count = chunk
+    tree = AVLTree()
+    node = tree._build(keys, counts, 0, len(keys))
+    other = tree._build(other_keys, other_counts, 0, len(other_keys))
+    tree.root = tree._combine_roots(node, other, count)
+    flat = tree._flat()
+    prefix = flat["prefix"]
+    return flat["keys"], [prefix[k + 1] - prefix[k] for k in range(len(flat["keys"]))]
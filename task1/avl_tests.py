@@ -1,5 +1,12 @@
-from avl import AVLNode, AVLTree
+from avl import AVLNode, AVLTree, BufferedAVLTree, FrozenAVLTree, MAX, MIN, Monoid, SUM
+from avl_viz import write_dot
+import asyncio
 import copy
+import io
+import os
+import random
+import tempfile
+from collections import Counter
 
 def test_insert():
     tree = AVLTree()
@@ -97,4 +104,557 @@ def test_copy():
     assert copy_tree.size() == tree.size()
     assert copy_tree.traverse("inorder") == tree.traverse("inorder")
     tree.remove(30)
-    assert copy_tree.size() != tree.size()
\ No newline at end of file
+    assert copy_tree.size() != tree.size()
+
+def test_split_large():
+    tree = AVLTree()
+    values = [(i * 7919) % 1000 + 1 for i in range(2000)]
+    for v in values:
+        tree.insert(v)
+    for key in [0, 1, 250, 500, 999, 1000]:
+        copy_tree = copy.copy(tree)
+        left, right = copy_tree.split(key)
+        assert copy_tree.size() == 0
+        assert left.validate_avl() == True
+        assert right.validate_avl() == True
+        assert left.traverse("inorder") == sorted(v for v in values if v <= key)
+        assert right.traverse("inorder") == sorted(v for v in values if v > key)
+        
+def test_join():
+    left = AVLTree()
+    right = AVLTree()
+    for v in range(1, 100):
+        left.insert(v)
+    for v in [200, 300, 300]:
+        right.insert(v)
+    tree = AVLTree.join(left, 150, right)
+    assert tree.validate_avl() == True
+    assert tree.traverse("inorder") == list(range(1, 100)) + [150, 200, 300, 300]
+    assert tree.size() == 103
+    assert left.size() == 0 and right.size() == 0
+    try:
+        AVLTree.join(tree, 120, AVLTree())
+        assert False
+    except ValueError:
+        pass
+    
+def test_merge_disjoint():
+    tree1 = AVLTree()
+    tree2 = AVLTree()
+    values1 = [v for v in range(1, 500)] * 2
+    values2 = [v for v in range(500, 520)]
+    for v in values1:
+        tree1.insert(v)
+    for v in values2:
+        tree2.insert(v)
+    tree2.merge(tree1)
+    assert tree2.validate_avl() == True
+    assert tree2.traverse("inorder") == sorted(values1 + values2)
+    assert tree2.size() == len(values1 + values2)
+    # other не изменяется и далее не зависит от результата слияния
+    assert tree1.traverse("inorder") == sorted(values1)
+    tree1.remove(1)
+    tree2.insert(1000)
+    assert tree1.size() == len(values1) - 1
+    assert tree2.traverse("inorder") == sorted(values1 + values2 + [1000])
+    
+def test_rank_select():
+    tree = AVLTree()
+    values = [10, 20, 30, 40, 50, 25, 25, 25, 5, 15, 35, 45, 55, 1000, 1500, 2000, 2500, 3000, 3500, 4000, 4500, 5000, 60000, 7000]
+    for v in values:
+        tree.insert(v)
+    ordered = sorted(values)
+    for i, v in enumerate(ordered):
+        assert tree.select(i) == v
+        assert tree.rank(v) == ordered.index(v)
+    assert tree.select(-1) == max(values)
+    assert tree.rank(1) == 0
+    assert tree.rank(100000) == len(values)
+    try:
+        tree.select(len(values))
+        assert False
+    except IndexError:
+        pass
+    
+def test_count_range():
+    tree = AVLTree()
+    values = [10, 20, 30, 40, 50, 25, 25, 25, 5, 15, 35, 45, 55, 1000, 1500, 2000, 2500, 3000, 3500, 4000, 4500, 5000, 60000, 7000]
+    for v in values:
+        tree.insert(v)
+    for lo, hi in [(1, 100000), (25, 25), (20, 40), (26, 29), (100, 1), (21, 5000)]:
+        assert tree.count_range(lo, hi) == len([v for v in values if lo <= v <= hi])
+        
+def test_percentile():
+    tree = AVLTree()
+    values = list(range(1, 101)) + [50] * 10
+    for v in values:
+        tree.insert(v)
+    assert tree.percentile(0) == 1
+    assert tree.percentile(100) == 100
+    assert tree.median() == sorted(values)[(len(values) - 1) // 2]
+    assert tree.percentile(90) == sorted(values)[98]
+    
+def test_from_sorted():
+    values = [1, 2, 2, 2, 5, 7, 7, 10, 11, 12, 13, 14, 15, 20]
+    tree = AVLTree.from_sorted(values)
+    assert tree.validate_avl() == True
+    assert tree.traverse("inorder") == values
+    assert tree.size() == len(values)
+    assert AVLTree.from_sorted([]).size() == 0
+    try:
+        AVLTree.from_sorted([3, 2, 1])
+        assert False
+    except ValueError:
+        pass
+    try:
+        AVLTree.from_sorted([0, 1])
+        assert False
+    except ValueError:
+        pass
+    
+def test_from_iterable():
+    values = [(i * 7919) % 1000 + 1 for i in range(3000)]
+    tree = AVLTree.from_iterable(values)
+    assert tree.validate_avl() == True
+    assert tree.traverse("inorder") == sorted(values)
+    assert tree.size() == len(values)
+    tree.insert(5000)
+    tree.remove(1)
+    assert tree.validate_avl() == True
+    assert tree.size() == len(values)
+    
+def structure(node):
+    if not node:
+        return None
+    return (node.key, node.height, node.size, node.count, structure(node.left), structure(node.right))
+
+def test_iterative_matches_recursive():
+    random.seed(4)
+    tree = AVLTree()
+    reference = AVLTree()
+    for _ in range(3000):
+        key = random.randint(1, 300)
+        if random.random() < 0.6:
+            tree.insert(key)
+            reference.root = reference._insert_recursive(reference.root, key)
+        else:
+            tree.remove(key)
+            reference.root = reference._remove_recursive(reference.root, key)
+        assert tree.root is None or tree.root.key == reference.root.key
+    assert tree.validate_avl() == reference._validate_avl_recursive(reference.root) == True
+    for order in ["inorder", "preorder", "postorder"]:
+        result = []
+        reference._traverse_recursive(reference.root, result, order)
+        assert tree.traverse(order) == result
+    assert structure(tree.root) == structure(reference.root)
+    left, right = tree.split(150)
+    ref_left, ref_right = reference._split_recursive(reference.root, 150)
+    assert structure(left.root) == structure(ref_left)
+    assert structure(right.root) == structure(ref_right)
+    
+def test_deep_tree_no_recursion():
+    # Вырожденное дерево-цепочка глубже предела рекурсии
+    tree = AVLTree()
+    node = tree.root = AVLNode(1)
+    for key in range(2, 20000):
+        node.right = AVLNode(key)
+        node = node.right
+    assert tree.traverse("inorder") == list(range(1, 20000))
+    assert tree.traverse("postorder") == list(range(19999, 0, -1))
+    assert tree.validate_avl() == False
+    assert copy.copy(tree).traverse("preorder") == list(range(1, 20000))
+    
+def test_iter():
+    tree = AVLTree()
+    values = [10, 20, 30, 40, 50, 25, 25, 25, 5, 15, 35, 45, 55, 1000, 1500, 2000, 2500, 3000, 3500, 4000, 4500, 5000, 60000, 7000]
+    for v in values:
+        tree.insert(v)
+    assert list(tree) == sorted(values)
+    assert list(reversed(tree)) == sorted(values, reverse=True)
+    assert list(AVLTree()) == []
+    assert 25 in tree and 26 not in tree
+    
+def test_iter_range():
+    tree = AVLTree()
+    values = [10, 20, 30, 40, 50, 25, 25, 25, 5, 15, 35, 45, 55, 1000, 1500, 2000, 2500, 3000, 3500, 4000, 4500, 5000, 60000, 7000]
+    for v in values:
+        tree.insert(v)
+    for lo, hi in [(1, 100000), (25, 25), (20, 40), (26, 29), (100, 1), (21, 5000)]:
+        assert list(tree.iter_range(lo, hi)) == sorted(v for v in values if lo <= v <= hi)
+        assert list(tree.iter_range(lo, hi, inclusive=(False, False))) == sorted(v for v in values if lo < v < hi)
+        assert list(tree.iter_range(lo, hi, inclusive=(True, False))) == sorted(v for v in values if lo <= v < hi)
+    assert list(tree.iter_range(20, 30, with_counts=True)) == [(20, 1), (25, 3), (30, 1)]
+    
+def test_iter_from():
+    tree = AVLTree()
+    for v in range(1, 10000):
+        tree.insert(v)
+    tree.insert(5000)
+    it = tree.iter_from(4999)
+    assert [next(it) for _ in range(4)] == [4999, 5000, 5000, 5001]
+    assert list(tree.iter_from(9998, with_counts=True)) == [(9998, 1), (9999, 1)]
+    assert list(tree.iter_from(20000)) == []
+    
+def test_node_slots():
+    node = AVLNode(1)
+    assert not hasattr(node, "__dict__")
+    assert not hasattr(node, "agg")
+    tree = AVLTree.from_iterable([1, 2, 3], aggregate=SUM)
+    assert tree.root.agg == 6
+    assert not hasattr(tree.root, "__dict__")
+    assert not hasattr(AVLTree.from_iterable([1, 2, 3]).root, "agg")
+    try:
+        node.value = 1
+        assert False
+    except AttributeError:
+        pass
+    
+def test_insert_many():
+    random.seed(7)
+    tree = AVLTree()
+    values = []
+    for _ in range(20):
+        batch = [random.randint(1, 2000) for _ in range(random.randint(0, 500))]
+        tree.insert_many(batch)
+        values += batch
+        assert tree.validate_avl() == True
+        assert tree.size() == len(values)
+    assert tree.traverse("inorder") == sorted(values)
+    try:
+        tree.insert_many([1, 0])
+        assert False
+    except ValueError:
+        pass
+    
+def test_remove_many():
+    random.seed(8)
+    values = [random.randint(1, 1000) for _ in range(5000)]
+    tree = AVLTree.from_iterable(values)
+    for _ in range(20):
+        batch = [random.randint(-5, 1100) for _ in range(random.randint(0, 300))]
+        tree.remove_many(batch)
+        for key in batch:
+            if key in values:
+                values.remove(key)
+        assert tree.validate_avl() == True
+        assert tree.size() == len(values)
+    assert tree.traverse("inorder") == sorted(values)
+    
+def test_snapshot():
+    tree = AVLTree.from_iterable(range(1, 1000))
+    snapshot = tree.snapshot()
+    assert snapshot.root is tree.root
+    for v in range(1, 1000, 2):
+        tree.remove(v)
+    tree.insert_many([5000, 5000])
+    snapshot.insert(2)
+    assert snapshot.traverse("inorder") == sorted(list(range(1, 1000)) + [2])
+    assert tree.traverse("inorder") == list(range(2, 1000, 2)) + [5000, 5000]
+    assert snapshot.validate_avl() == True
+    assert tree.validate_avl() == True
+    assert copy.copy(tree).traverse("inorder") == tree.traverse("inorder")
+    assert copy.deepcopy(tree).traverse("preorder") == tree.traverse("preorder")
+    
+def test_split_snapshot():
+    left, right = AVLTree.from_iterable(range(1, 101)).split(50)
+    snapshot = right.snapshot()
+    shallow = copy.copy(right)
+    left.merge(right)
+    assert snapshot.traverse("inorder") == list(range(51, 101))
+    assert shallow.traverse("inorder") == list(range(51, 101))
+    assert left.traverse("inorder") == list(range(1, 101))
+    left, right = AVLTree.from_iterable(range(1, 101)).split(50)
+    snapshot = left.snapshot()
+    right.merge(left)
+    assert snapshot.traverse("inorder") == list(range(1, 51))
+    assert snapshot.validate_avl() == True
+    assert right.validate_avl() == True
+    
+def test_persistent():
+    tree = AVLTree(persistent=True)
+    versions = []
+    values = []
+    for v in [(i * 37) % 101 + 1 for i in range(200)]:
+        tree.insert(v)
+        values.append(v)
+        versions.append((tree.root, sorted(values)))
+    for i, v in enumerate(values[:50]):
+        tree.remove(v)
+        versions.append((tree.root, sorted(values[i + 1:])))
+    for root, expected in versions:
+        version = AVLTree()
+        version.root = root
+        assert version.traverse("inorder") == expected
+        assert version.validate_avl() == True
+    root = tree.root
+    left, right = tree.split(50)
+    assert tree.root is root
+    assert left.traverse("inorder") + right.traverse("inorder") == tree.traverse("inorder")
+    
+def test_stats():
+    tree = AVLTree()
+    assert "rotations" not in tree.stats()
+    events = []
+    tree.enable_stats(lambda event, value: events.append((event, value)))
+    for v in range(1, 8):
+        tree.insert(v)
+    tree.insert(4)
+    assert tree.search(4) == True
+    stats = tree.stats()
+    assert stats["size"] == 8
+    assert stats["nodes"] == 7
+    assert stats["height"] == 3
+    assert stats["rotations"] == {"rotate_left": 4, "rotate_right": 0}
+    assert sum(stats["descent_depth"]["histogram"].values()) == 9
+    assert stats["descent_depth"]["histogram"][0] == 1 # Вставка в пустое дерево
+    assert stats["descent_depth"]["max"] == 3
+    assert events.count(("rotate_left", 1)) == 4
+    tree.disable_stats()
+    tree.insert(8)
+    assert "rotations" not in tree.stats()
+    assert "_descend" not in tree.__dict__ and "_find" not in tree.__dict__
+    
+def test_save_load():
+    values = [random.randint(1, 500) for _ in range(2000)]
+    tree = AVLTree.from_iterable(values)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tree.bin")
+        tree.save(path)
+        loaded = AVLTree.load(path)
+        assert loaded.traverse("inorder") == sorted(values)
+        assert loaded.validate_avl() == True
+        with AVLTree.load(path, mmap=True) as frozen:
+            assert isinstance(frozen, FrozenAVLTree)
+            assert list(frozen) == sorted(values)
+            assert len(frozen) == len(values)
+            for key in (0, 1, 250, 500, 501):
+                assert frozen.search(key) == tree.search(key)
+                assert frozen.rank(key) == tree.rank(key)
+                assert frozen.count_range(key, key + 100) == tree.count_range(key, key + 100)
+            assert [frozen.select(k) for k in range(0, 2000, 97)] == [tree.select(k) for k in range(0, 2000, 97)]
+            assert frozen.select(-1) == tree.max()
+            assert frozen.to_tree().traverse("inorder") == sorted(values)
+        AVLTree().save(path)
+        assert AVLTree.load(path).root is None
+        with open(path, "r+b") as f:
+            f.write(b"XXXX")
+        try:
+            AVLTree.load(path)
+            assert False
+        except ValueError:
+            pass
+    
+def test_batch_lookups():
+    values = [random.randint(1, 300) for _ in range(1000)]
+    tree = AVLTree.from_iterable(values)
+    queries = list(range(0, 310))
+    assert tree.search_many(queries) == [tree.search(q) for q in queries]
+    assert tree.rank_many(queries) == [tree.rank(q) for q in queries]
+    assert tree.count_many(queries) == [values.count(q) for q in queries]
+    tree.insert(1000)
+    tree.remove_many(values[:500])
+    assert tree.search_many([1000]) == [True]
+    assert tree.rank_many(queries) == [tree.rank(q) for q in queries]
+    left, right = tree.split(150)
+    assert tree.search_many([1000]) == [False]
+    assert right.count_many([1000]) == [1]
+    try:
+        import numpy as np
+    except ImportError:
+        return
+    array = np.array(queries)
+    assert tree.search_many(array).tolist() == [False] * len(queries)
+    assert right.search_many(array).tolist() == right.search_many(queries)
+    assert right.rank_many(array).tolist() == right.rank_many(queries)
+    assert right.count_many(array).tolist() == right.count_many(queries)
+    
+def test_set_operations():
+    a_values = [random.randint(1, 200) for _ in range(600)]
+    b_values = [random.randint(100, 300) for _ in range(300)]
+    a, b = AVLTree.from_iterable(a_values), AVLTree.from_iterable(b_values)
+    ca, cb = Counter(a_values), Counter(b_values)
+    expected = {
+        "union": ca | cb,
+        "intersection": ca & cb,
+        "difference": ca - cb,
+        "symmetric_difference": (ca - cb) + (cb - ca),
+    }
+    for workers in (None, 3):
+        for name, counter in expected.items():
+            for left, right, c in ((a, b, counter), (b, a, None)):
+                result = getattr(left, name)(right, workers=workers)
+                assert result.validate_avl() == True
+                if c is not None:
+                    assert result.traverse("inorder") == sorted(c.elements())
+    assert b.difference(a).traverse("inorder") == sorted((cb - ca).elements())
+    # Параллельный путь напрямую: публичные операции выбирают его только для больших деревьев на нескольких процессорах
+    for count, counter in ((max, ca | cb), (min, ca & cb)):
+        result = a._empty()
+        result.root = result._combine_parallel(a, b, count, 3)
+        assert result.traverse("inorder") == sorted(counter.elements())
+    assert a.traverse("inorder") == sorted(a_values)
+    assert b.traverse("inorder") == sorted(b_values)
+    union = a.union(b)
+    a.insert(5000)
+    assert 5000 not in union
+    assert AVLTree().intersection(a).root is None
+    assert AVLTree().union(a).traverse("inorder") == a.traverse("inorder")
+    # Пустые и маленькие деревья при workers > 1 обрабатываются последовательно
+    assert AVLTree().union(AVLTree(), workers=2).root is None
+    assert AVLTree().symmetric_difference(AVLTree.from_iterable([7, 7]), workers=4).traverse("inorder") == [7, 7]
+    
+def test_range_aggregate():
+    count = Monoid(0, lambda key, count: count, lambda a, b: a + b)
+    for monoid, brute in ((SUM, sum), (MIN, lambda xs: min(xs, default=float("inf"))),
+                          (MAX, lambda xs: max(xs, default=float("-inf"))), (count, len)):
+        tree = AVLTree(aggregate=monoid)
+        values = []
+        for _ in range(500):
+            v = random.randint(1, 100)
+            if random.random() < 0.3 and v in values:
+                tree.remove(v)
+                values.remove(v)
+            else:
+                tree.insert(v)
+                values.append(v)
+        tree.insert_many([5, 5, 50])
+        tree.remove_many([50, 7])
+        values += [5, 5, 50]
+        values.remove(50)
+        if 7 in values:
+            values.remove(7)
+        for lo, hi in ((1, 100), (10, 20), (33, 33), (50, 40), (0, 1000)):
+            assert tree.range_aggregate(lo, hi) == brute([v for v in values if lo <= v <= hi])
+        left, right = tree.split(50)
+        assert left.range_aggregate(1, 100) == brute([v for v in values if v <= 50])
+        left.merge(right)
+        assert left.range_aggregate(20, 80) == brute([v for v in values if 20 <= v <= 80])
+    tree = AVLTree.from_iterable(range(1, 101), aggregate=SUM)
+    snapshot = tree.snapshot()
+    tree.remove(10)
+    assert tree.range_aggregate(1, 100) == 5040
+    assert snapshot.range_aggregate(1, 100) == 5050
+    assert tree.union(AVLTree.from_iterable([10, 200], aggregate=SUM)).range_aggregate(1, 1000) == 5250
+    try:
+        tree.merge(AVLTree.from_iterable([1]))
+        assert False
+    except ValueError:
+        pass
+    try:
+        AVLTree().range_aggregate(1, 2)
+        assert False
+    except ValueError:
+        pass
+    
+def test_floor_ceiling_remove_range():
+    values = [random.randint(1, 200) for _ in range(300)]
+    tree = AVLTree.from_iterable(values)
+    for key in range(0, 205):
+        assert tree.floor(key) == max((v for v in values if v <= key), default=None)
+        assert tree.ceiling(key) == min((v for v in values if v >= key), default=None)
+    for persistent in (False, True):
+        tree = AVLTree(persistent)
+        tree.insert_many(values)
+        before = tree.root
+        removed = tree.remove_range(50, 120)
+        assert removed.traverse("inorder") == sorted(v for v in values if 50 <= v <= 120)
+        assert tree.traverse("inorder") == sorted(v for v in values if not 50 <= v <= 120)
+        assert tree.validate_avl() == True
+        assert removed.validate_avl() == True
+        removed.insert(60)
+        tree.insert(60)
+        assert tree.count_range(50, 120) == 1
+        if persistent:
+            version = AVLTree()
+            version.root = before
+            assert version.traverse("inorder") == sorted(values)
+    assert tree.remove_range(10, 5).root is None
+    tree = AVLTree.from_iterable(range(1, 101))
+    removed = tree.remove_range(40, 60)
+    snapshot = removed.snapshot()
+    kept = tree.snapshot()
+    tree.merge(removed)
+    assert snapshot.traverse("inorder") == list(range(40, 61))
+    assert kept.traverse("inorder") == list(range(1, 40)) + list(range(61, 101))
+    assert tree.traverse("inorder") == list(range(1, 101))
+    assert tree.validate_avl() == True
+    
+def test_buffered():
+    values = [random.randint(1, 1000) for _ in range(3000)] + list(range(2000, 3000))
+    tree = BufferedAVLTree(buffer_size=64)
+    assert tree.ingest(v for v in values[:100]) == 100
+    assert tree._pending > 0
+    assert tree.search(values[99]) == True
+    assert tree.size() == 100
+    assert tree._pending > 0 # search и size не сбрасывают буфер
+    for v in values[100:]:
+        tree.insert(v)
+    assert tree.size() == len(values)
+    assert tree.traverse("inorder") == sorted(values)
+    assert tree._pending == 0
+    assert tree.validate_avl() == True
+    tree.insert(5000)
+    tree.remove(values[0])
+    values.remove(values[0])
+    assert tree.max() == 5000
+    assert tree.count_range(1, 1000) == len([v for v in values if v <= 1000])
+    tree.insert(6000)
+    left, right = tree.split(1500)
+    assert isinstance(left, BufferedAVLTree)
+    assert right.traverse("inorder") == list(range(2000, 3000)) + [5000, 6000]
+    
+    async def stream():
+        for v in range(100, 0, -1):
+            yield v
+            
+    tree = BufferedAVLTree(aggregate=SUM, buffer_size=16)
+    tree.insert_many([200, 300])
+    assert asyncio.run(tree.aingest(stream())) == 100
+    assert tree.range_aggregate(1, 1000) == 5050 + 500
+    assert 50 in tree
+    assert tree.traverse("inorder") == list(range(1, 101)) + [200, 300]
+    try:
+        BufferedAVLTree(buffer_size=0)
+        assert False
+    except ValueError:
+        pass
+    # Пакетные запросы и save() видят ключи, вставленные после построения кэша
+    tree = BufferedAVLTree(buffer_size=1000)
+    tree.ingest(range(1, 2001, 2))
+    tree.flush()
+    assert tree.search_many([1]) == [True]
+    tree.insert(3)
+    tree.insert(3)
+    assert tree.count_many([3]) == [3]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tree.avl")
+        tree.save(path)
+        assert AVLTree.load(path).size() == tree.size() == 1002
+    # Операции, отделяющие узлы дерева, сначала сбрасывают буфер
+    tree = BufferedAVLTree(buffer_size=1000)
+    tree.ingest(range(1, 202))
+    union = tree.union(AVLTree())
+    for key in range(1, 102):
+        tree.remove(key)
+    assert union.traverse("inorder") == list(range(1, 202))
+    assert tree.traverse("inorder") == list(range(102, 202))
+    
+def test_write_dot():
+    tree = AVLTree.from_iterable(list(range(1, 1024)) + [7, 7])
+    out = io.StringIO()
+    assert write_dot(tree, out) == 1023
+    text = out.getvalue()
+    assert text.startswith("digraph {") and text.rstrip().endswith("}")
+    assert text.count(" -> ") == 1022
+    assert text.count("fillcolor") == 1 # Дубликаты ключа 7
+    out = io.StringIO()
+    assert write_dot(tree, out, max_depth=2) == 7
+    assert out.getvalue().count("keys") == 8 # Свёрнутые поддеревья на глубине 3
+    assert '"127 keys\\nH:7"' in out.getvalue()
+    out = io.StringIO()
+    assert write_dot(tree, out, collapse_height=8) == 3
+    out = io.StringIO()
+    written = write_dot(tree, out, sample=0.5, seed=1)
+    assert 1 <= written < 1023
+    assert out.getvalue().count(" -> ") == out.getvalue().count("[label=") + out.getvalue().count("[shape=box") - 1
+    assert write_dot(AVLTree(), io.StringIO()) == 0
@@ -1,4 +1,6 @@
-from graphviz import Digraph
+import random
+from typing import Optional, TextIO, Union
+
 from avl import AVLNode, AVLTree
 
 def add_nodes_edges(dot, node):
@@ -13,11 +15,59 @@ def add_nodes_edges(dot, node):
         add_nodes_edges(dot, node.right)
 
 def visualize_avl_tree(tree: AVLTree):
+    # graphviz нужен только для построения Digraph в памяти; write_dot обходится без него
+    from graphviz import Digraph
     dot = Digraph()
     if tree.root:
         add_nodes_edges(dot, tree.root)
     return dot
 
+def _quote(text: str) -> str:
+    # Строка DOT в кавычках; ключи не обязательно числа (см. task3), поэтому экранируем спецсимволы
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+def write_dot(tree: AVLTree, out: Union[str, TextIO], max_depth: Optional[int] = None, collapse_height: int = 0,
+              sample: float = 1.0, seed: Optional[int] = None) -> int:
+    """Потоковая запись дерева в формате DOT с ограничением глубины, сворачиванием и выборкой поддеревьев.
+    Возвращает количество записанных узлов дерева"""
+    if isinstance(out, str):
+        with open(out, "w") as f:
+            return write_dot(tree, f, max_depth, collapse_height, sample, seed)
+    rng = random.Random(seed)
+    out.write("digraph {\n")
+    out.write("  node [fontname=monospace];\n")
+    written = 0
+    ids = 0 # Узлы нумеруются по порядку обхода: ключи в DOT не используются, поэтому имена уникальны
+    stack = [(tree.root, 0, None)] if tree.root else []
+    while stack:
+        node, depth, parent = stack.pop()
+        name = f"n{ids}"
+        ids += 1
+        if parent is not None:
+            out.write(f"  {parent} -> {name};\n")
+        expand = parent is None or (
+            (max_depth is None or depth <= max_depth)
+            and node.height > collapse_height
+            and (sample >= 1 or rng.random() < sample)
+        )
+        if not expand:
+            # Свёрнутое поддерево: показываем только его размер и высоту
+            label = f"{tree._size(node)} keys\nH:{node.height}"
+            out.write(f"  {name} [shape=box, style=dashed, label={_quote(label)}];\n")
+            continue
+        label = f"{node.key}\nH:{node.height}\nS:{node.size}\nC:{node.count}"
+        # Ключи с дубликатами выделяются цветом, чтобы были видны горячие точки
+        style = ", style=filled, fillcolor=salmon" if node.count > 1 else ""
+        out.write(f"  {name} [label={_quote(label)}{style}];\n")
+        written += 1
+        # Правый потомок кладётся в стек первым, чтобы левый был записан раньше
+        if node.right:
+            stack.append((node.right, depth + 1, name))
+        if node.left:
+            stack.append((node.left, depth + 1, name))
+    out.write("}\n")
+    return written
+
 if __name__ == "__main__":
     tree = AVLTree()
     values = [10, 20, 30, 40, 50, 25, 5, 15, 35, 45, 55, 1000, 1500, 2000, 2500, 3000, 3500, 4000, 4500, 5000, 60000, 7000] * 2
@@ -26,6 +76,7 @@ if __name__ == "__main__":
     
     dot = visualize_avl_tree(tree)
     dot.render('./avl_tree', format='png')
+    write_dot(tree, './avl_tree_top.dot', max_depth=2)
 
     print("Inorder:", tree.traverse("inorder"))
     print("Preorder:", tree.traverse("preorder"))
@@ -1,81 +1,1145 @@
-from typing import Generator, Tuple, Hashable
+import mmap
+import pickle
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Any, Callable, Generator, Iterable, List, Mapping, Tuple, Hashable, Union
+
+_EMPTY = -1 # Свободный слот индекса
+_DUMMY = -2 # Слот индекса удалённой записи (не прерывает цепочку проб)
+_DELETED = object() # Маркер удалённой записи в плотных массивах
+_PERTURB_SHIFT = 5
+
+def _capacity_for(n: int, load: float, minimum: int) -> int:
+    # Наименьшая степень двойки не меньше minimum, при которой n элементов дают заполненность не выше load
+    capacity = minimum
+    while n > capacity * load:
+        capacity *= 2
+    return capacity
+
+def _pairs(items: Union[Mapping, Iterable[Tuple[Hashable, Any]]]) -> List[Tuple[Hashable, Any]]:
+    # Отображение (в том числе HashMap и AssociativeArray) или последовательность пар -- в список пар
+    return list(items.items() if hasattr(items, "items") else items)
+
+_MISSING = object() # Значение по умолчанию не задано
+
+def _check_capacity(capacity: int, load_factor: float) -> None:
+    if capacity < 1:
+        raise ValueError("Capacity must be positive")
+    if load_factor <= 0:
+        raise ValueError("Load factor must be positive")
+
+_INSTRUMENTED = ("put", "get", "remove", "_lookup", "_find", "_rebuild", "_rehash_step")
+
+def _enable_stats(m: Any, hook: Callable[[str, float], None] | None) -> None:
+    # Обёртки ставятся атрибутами экземпляра: пока статистика выключена, вызываются методы класса без накладных расходов
+    m._stats = {"resizes": 0, "resize_seconds": 0.0}
+    m._probe_lengths = Counter()
+    m._stats_hook = hook
+    cls = type(m)
+    # Длина пробы считается в самом поиске операции, а не отдельным проходом
+    for name in ("put", "get", "remove", "_lookup", "_find"):
+        if hasattr(cls, "_measured_" + name.lstrip("_")):
+            m.__dict__[name] = getattr(m, "_measured_" + name.lstrip("_"))
+    for name in ("_rebuild", "_rehash_step"):
+        if hasattr(cls, name):
+            m.__dict__[name] = _timed(m, getattr(cls, name).__get__(m))
+
+def _disable_stats(m: Any) -> None:
+    for name in _INSTRUMENTED:
+        m.__dict__.pop(name, None)
+    m._stats = None
+
+def _record_probe(m: Any, length: int) -> None:
+    m._probe_lengths[length] += 1
+    if m._stats_hook:
+        m._stats_hook("probe", length)
+
+def _timed(m: Any, rebuild: Callable) -> Callable:
+    def wrapper(*args: Any) -> None:
+        capacity = m.capacity
+        start = time.perf_counter()
+        rebuild(*args)
+        elapsed = time.perf_counter() - start
+        m._stats["resize_seconds"] += elapsed
+        if m.capacity != capacity:
+            m._stats["resizes"] += 1
+        if m._stats_hook:
+            m._stats_hook("resize", elapsed)
+    return wrapper
+
+def _counters(m: Any) -> dict:
+    # Накопленные счётчики инструментирования в виде словаря для stats()
+    lengths = m._probe_lengths
+    lookups = sum(lengths.values())
+    return {
+        **m._stats,
+        "lookups": lookups,
+        "probe_length": {
+            "histogram": dict(sorted(lengths.items())),
+            "avg": sum(length * count for length, count in lengths.items()) / lookups if lookups else 0.0,
+            "max": max(lengths, default=0),
+        },
+    }
+
+# Заголовок двоичного файла HashMap: сигнатура, версия формата, ёмкость, минимальная ёмкость, количество элементов,
+# load_factor, признак постепенного расширения, признак независимости хешей всех ключей от процесса и хеш пробной
+# строки. За ним следуют массивы int64: границы корзин (capacity + 1), хеши записей, смещения сериализованных
+# записей (size + 1), а затем сами записи (pickle)
+_MAP_HEADER = struct.Struct("<4sIQQQdQQq")
+_MAP_MAGIC = b"HMAP"
+_MAP_VERSION = 2
+_HASH_PROBE = "alg_selection_task"
+
+def _stable_hash(key: Hashable) -> bool:
+    # Хеш не зависит от PYTHONHASHSEED и процесса: числа (кроме NaN, чей хеш зависит от объекта), None,
+    # а также кортежи и frozenset из таких значений. Подклассы могут переопределять __hash__, поэтому тип точный
+    t = type(key)
+    if key is None or t is int or t is bool:
+        return True
+    if t is float or t is complex:
+        return key == key
+    if t is tuple or t is frozenset:
+        return all(map(_stable_hash, key))
+    return False
+
+class _MapFile:
+    # Разбор файла HashMap.save() поверх bytes или mmap; массивы читаются без копирования
+    def __init__(self, buffer: Any) -> None:
+        if sys.byteorder != "little":
+            raise ValueError("Binary format requires a little-endian platform")
+        if len(buffer) < _MAP_HEADER.size:
+            raise ValueError("Not a HashMap file")
+        magic, version, capacity, min_capacity, size, load_factor, incremental, stable, probe = _MAP_HEADER.unpack_from(buffer)
+        if magic != _MAP_MAGIC:
+            raise ValueError("Not a HashMap file")
+        if version != _MAP_VERSION:
+            raise ValueError(f"Unsupported file version: {version}")
+        self.capacity, self.min_capacity, self.size = capacity, min_capacity, size
+        self.load_factor, self.incremental = load_factor, bool(incremental)
+        # Хеши строк зависят от PYTHONHASHSEED: сохранённые хеши и раскладка корзин годятся, если хеши всех ключей
+        # не зависят от процесса или хеш пробной строки совпал с хешем в процессе, сохранившем таблицу
+        self.same_hashes = bool(stable) or probe == hash(_HASH_PROBE)
+        start = _MAP_HEADER.size
+        self.data = start + 8 * (capacity + 1 + size + size + 1)
+        if len(buffer) < self.data:
+            raise ValueError("Truncated HashMap file")
+        self.view = memoryview(buffer)
+        self.starts = self.view[start:start + 8 * (capacity + 1)].cast('q')
+        start += 8 * (capacity + 1)
+        self.hashes = self.view[start:start + 8 * size].cast('q')
+        start += 8 * size
+        self.offsets = self.view[start:self.data].cast('q')
+        if len(buffer) != self.data + self.offsets[-1]:
+            self.release()
+            raise ValueError("Truncated HashMap file")
+
+    def entry(self, i: int) -> Tuple[Hashable, Any]:
+        return pickle.loads(self.view[self.data + self.offsets[i]:self.data + self.offsets[i + 1]])
+
+    def release(self) -> None:
+        for view in (self.starts, self.hashes, self.offsets, self.view):
+            view.release()
 
 class HashMap[T]:
-    def __init__(self, capacity=16, load_factor=0.75) -> None:
-        self.capacity = capacity
+    rehash_step = 4 # Количество корзин, переносимых за одну операцию при постепенном расширении
+
+    def __init__(self, capacity=16, load_factor=0.75, incremental=False) -> None:
+        _check_capacity(capacity, load_factor)
+        self.capacity = 1 << (capacity - 1).bit_length() # Степень двойки: индекс корзины берётся маской
+        # Ниже этой ёмкости таблица не сжимается автоматически
+        self.min_capacity = self.capacity
         self.load_factor = load_factor
         self.size = 0
+        # Записи хранятся как (хеш, ключ, значение): хеш не пересчитывается при расширении
+        # и позволяет пропускать ключи с другим хешем без вызова __eq__
         self.table = [[] for _ in range(self.capacity)]
+        # При постепенном расширении корзины делятся по одной (как в линейном хешировании):
+        # корзина i < _split уже разнесена по корзинам i и i + capacity в конце таблицы
+        self.incremental = incremental
+        self._resizing = False
+        self._split = 0
+        self._stats: dict | None = None # Счётчики инструментирования (см. enable_stats)
         
-    def _hash(self, key: Hashable) -> int:
-        return hash(key) % self.capacity
+    def _bucket(self, h: int) -> int:
+        i = h & (self.capacity - 1)
+        if i < self._split:
+            i = h & (2 * self.capacity - 1) # Корзина уже разделена
+        return i
+
+    def _rehash_step(self) -> None:
+        # Делим не более rehash_step корзин; по завершении удваиваем capacity
+        for _ in range(self.rehash_step):
+            i = self._split
+            stay, move = [], []
+            for entry in self.table[i]:
+                (move if entry[0] & self.capacity else stay).append(entry)
+            self.table[i] = stay
+            self.table.append(move) # Корзина i + capacity
+            self._split += 1
+            if self._split == self.capacity:
+                self.capacity *= 2
+                self._split = 0
+                self._resizing = False
+                return
     
-    def _resize(self) -> None:
-        self.capacity *= 2
-        new_table = [[] for _ in range(self.capacity)]
+    def _rebuild(self, capacity: int) -> None:
+        # Полное перестроение таблицы с заданной ёмкостью (незавершённое постепенное расширение поглощается)
+        mask = capacity - 1
+        new_table = [[] for _ in range(capacity)]
         for bucket in self.table:
-            for k, v in bucket:
-                h = self._hash(k) # Пересчитываем хеш для новой таблицы
-                new_table[h].append((k, v)) # Копирование элементов в новую таблицу
+            for entry in bucket:
+                new_table[entry[0] & mask].append(entry) # Хеш уже сохранён в записи
         self.table = new_table
+        self.capacity = capacity
+        self._split = 0
+        self._resizing = False
+
+    def _resize(self) -> None:
+        self._rebuild(self.capacity * 2)
+
+    def _maybe_shrink(self) -> None:
+        # Гистерезис: сжимаемся, когда заполненность падает ниже четверти порога расширения,
+        # до ёмкости с заполненностью около половины порога. В инкрементальном режиме таблица автоматически
+        # не сжимается: полное перестроение нарушило бы ограничение задержки одной операции, сжатие -- через compact()
+        if self.incremental:
+            return
+        if self.capacity > self.min_capacity and self.size < self.capacity * self.load_factor / 4:
+            self._rebuild(_capacity_for(self.size, self.load_factor / 2, self.min_capacity))
+
+    def reserve(self, n: int) -> None:
+        """Резервирование места под n элементов; ёмкость не опускается ниже резерва до вызова compact()"""
+        capacity = _capacity_for(n, self.load_factor, self.min_capacity)
+        self.min_capacity = capacity
+        current = self.capacity * 2 if self._resizing else self.capacity
+        if capacity > current:
+            self._rebuild(capacity)
+
+    def compact(self) -> None:
+        """Сжатие таблицы до минимальной ёмкости, вмещающей текущие элементы; сбрасывает резерв"""
+        self.min_capacity = 1
+        self._rebuild(_capacity_for(self.size, self.load_factor, 1))
+
+    @classmethod
+    def from_items(cls, items: Union[Mapping, Iterable[Tuple[Hashable, T]]], load_factor=0.75) -> 'HashMap[T]':
+        """Построение таблицы из пар ключ-значение с однократным выделением памяти"""
+        m = cls(load_factor=load_factor)
+        m.put_many(items)
+        return m
+
+    def put_many(self, items: Union[Mapping, Iterable[Tuple[Hashable, T]]]) -> None:
+        """Пакетное добавление пар ключ-значение; таблица расширяется не более одного раза"""
+        items = _pairs(items)
+        capacity = _capacity_for(self.size + len(items), self.load_factor, self.capacity)
+        current = self.capacity * 2 if self._resizing else self.capacity
+        if capacity > current or self._resizing:
+            self._rebuild(max(capacity, current))
+        table, mask = self.table, self.capacity - 1
+        for key, value in items:
+            h = hash(key)
+            bucket = table[h & mask]
+            for i, (eh, k, _) in enumerate(bucket):
+                if eh == h and (k is key or k == key):
+                    bucket[i] = (h, key, value)
+                    break
+            else:
+                bucket.append((h, key, value))
+                self.size += 1
+
+    def get_many(self, keys: Iterable[Hashable], default: Any = _MISSING) -> List[T]:
+        """Пакетное получение значений; без default отсутствующий ключ вызывает KeyError"""
+        if self._resizing:
+            self._rehash_step()
+        table, bucket_of = self.table, self._bucket
+        result = []
+        for key in keys:
+            h = hash(key)
+            for eh, k, v in table[bucket_of(h)]:
+                if eh == h and (k is key or k == key):
+                    result.append(v)
+                    break
+            else:
+                if default is _MISSING:
+                    raise KeyError(key)
+                result.append(default)
+        return result
+
+    def remove_many(self, keys: Iterable[Hashable]) -> int:
+        """Пакетное удаление ключей; отсутствующие ключи пропускаются. Возвращает количество удалённых элементов"""
+        if self._resizing:
+            self._rebuild(self.capacity * 2)
+        table, mask = self.table, self.capacity - 1
+        removed = 0
+        for key in keys:
+            h = hash(key)
+            bucket = table[h & mask]
+            for i, (eh, k, _) in enumerate(bucket):
+                if eh == h and (k is key or k == key):
+                    bucket.pop(i)
+                    removed += 1
+                    break
+        self.size -= removed
+        self._maybe_shrink()
+        return removed
         
     def put(self, key: Hashable, value: T) -> None:
         """Добавление элемента"""
-        if (self.size + 1) / self.capacity > self.load_factor:
-            self._resize()
+        if self._resizing:
+            self._rehash_step()
+        elif (self.size + 1) / self.capacity > self.load_factor:
+            if self.incremental:
+                # Старые и новые корзины сосуществуют, перенос идёт в следующих операциях
+                self._resizing = True
+                self._rehash_step()
+            else:
+                self._resize()
             
-        h = self._hash(key)
-        bucket = self.table[h]
-        for i, (k, _) in enumerate(bucket):
-            if k == key:
-                bucket[i] = (key, value)  # Обновление значения
+        h = hash(key)
+        bucket = self.table[self._bucket(h)]
+        for i, (eh, k, _) in enumerate(bucket):
+            if eh == h and (k is key or k == key):
+                bucket[i] = (h, key, value)  # Обновление значения
                 return
         
-        bucket.append((key, value)) # Добавление нового элемента (метод цепочек)
+        bucket.append((h, key, value)) # Добавление нового элемента (метод цепочек)
         self.size += 1
         
     def get(self, key: Hashable) -> T:
         """Получение значения по ключу"""
-        h = self._hash(key)
-        bucket = self.table[h]
-        for k, v in bucket:
-            if k == key:
+        if self._resizing:
+            self._rehash_step()
+        h = hash(key)
+        for eh, k, v in self.table[self._bucket(h)]:
+            if eh == h and (k is key or k == key):
                 return v
         raise KeyError(key)
     
     def remove(self, key: Hashable) -> None:
         """Удаление элемента по ключу"""
-        h = self._hash(key)
-        bucket = self.table[h]
-        for i, (k, _) in enumerate(bucket):
-            if k == key:
+        if self._resizing:
+            self._rehash_step()
+        h = hash(key)
+        bucket = self.table[self._bucket(h)]
+        for i, (eh, k, _) in enumerate(bucket):
+            if eh == h and (k is key or k == key):
                 bucket.pop(i)
                 self.size -= 1
+                if not self._resizing:
+                    self._maybe_shrink()
                 return
         raise KeyError(key)
     
+    def enable_stats(self, hook: Callable[[str, float], None] | None = None) -> None:
+        """Включение счётчиков длины проб и перестроений; hook(событие, значение) получает каждое событие"""
+        _enable_stats(self, hook)
+
+    def disable_stats(self) -> None:
+        """Отключение счётчиков и сброс накопленной статистики"""
+        _disable_stats(self)
+
+    # Версии put/get/remove, которые enable_stats() ставит поверх методов класса: они повторяют поиск
+    # в корзине и считают длину пробы в нём самом, поэтому без статистики put/get/remove ничего не считают
+    def _measured_locate(self, key: Hashable, h: int) -> Tuple[list, int]:
+        # Корзина ключа и позиция записи в ней (-1, если ключа нет); длина пробы -- просмотренные записи
+        bucket = self.table[self._bucket(h)]
+        for i, (eh, k, _) in enumerate(bucket):
+            if eh == h and (k is key or k == key):
+                _record_probe(self, i + 1)
+                return bucket, i
+        _record_probe(self, len(bucket))
+        return bucket, -1
+
+    def _measured_put(self, key: Hashable, value: T) -> None:
+        if self._resizing:
+            self._rehash_step()
+        elif (self.size + 1) / self.capacity > self.load_factor:
+            if self.incremental:
+                self._resizing = True
+                self._rehash_step()
+            else:
+                self._resize()
+        h = hash(key)
+        bucket, i = self._measured_locate(key, h)
+        if i >= 0:
+            bucket[i] = (h, key, value)
+        else:
+            bucket.append((h, key, value))
+            self.size += 1
+
+    def _measured_get(self, key: Hashable) -> T:
+        if self._resizing:
+            self._rehash_step()
+        bucket, i = self._measured_locate(key, hash(key))
+        if i < 0:
+            raise KeyError(key)
+        return bucket[i][2]
+
+    def _measured_remove(self, key: Hashable) -> None:
+        if self._resizing:
+            self._rehash_step()
+        bucket, i = self._measured_locate(key, hash(key))
+        if i < 0:
+            raise KeyError(key)
+        bucket.pop(i)
+        self.size -= 1
+        if not self._resizing:
+            self._maybe_shrink()
+
+    def stats(self) -> dict:
+        """Заполненность и гистограмма длин корзин, а при включённой статистике -- длины проб и перестроения"""
+        result = {
+            "size": self.size,
+            "capacity": len(self.table),
+            "load": self.size / len(self.table),
+            "buckets": dict(sorted(Counter(len(bucket) for bucket in self.table).items())),
+        }
+        if self._stats is not None:
+            result.update(_counters(self))
+        return result
+
+    def save(self, path: str) -> None:
+        """Сохранение таблицы в двоичный файл с раскладкой корзин; ключи и значения сериализуются pickle"""
+        if sys.byteorder != "little":
+            raise ValueError("Binary format requires a little-endian platform")
+        capacity = self.capacity * 2 if self._resizing else self.capacity
+        mask = capacity - 1
+        buckets = [[] for _ in range(capacity)]
+        for bucket in self.table:
+            for entry in bucket:
+                buckets[entry[0] & mask].append(entry)
+        starts, hashes, offsets = array('q', [0]), array('q'), array('q', [0])
+        blobs = []
+        stable = True
+        for bucket in buckets:
+            for h, k, v in bucket:
+                stable = stable and _stable_hash(k)
+                blob = pickle.dumps((k, v), pickle.HIGHEST_PROTOCOL)
+                hashes.append(h)
+                offsets.append(offsets[-1] + len(blob))
+                blobs.append(blob)
+            starts.append(len(hashes))
+        with open(path, "wb") as f:
+            f.write(_MAP_HEADER.pack(_MAP_MAGIC, _MAP_VERSION, capacity, self.min_capacity, self.size,
+                                     self.load_factor, self.incremental, stable, hash(_HASH_PROBE)))
+            starts.tofile(f)
+            hashes.tofile(f)
+            offsets.tofile(f)
+            f.writelines(blobs)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> Union['HashMap[T]', 'FrozenHashMap[T]']:
+        """Загрузка таблицы из файла save(); при mmap=True возвращается FrozenHashMap поверх отображённого файла.
+        Записи десериализуются pickle, поэтому загружать можно только файлы из доверенного источника"""
+        if mmap:
+            return FrozenHashMap(path)
+        with open(path, "rb") as f:
+            layout = _MapFile(f.read())
+        m = cls(layout.capacity, layout.load_factor, layout.incremental)
+        m.min_capacity = layout.min_capacity
+        if layout.same_hashes:
+            # Раскладка корзин переносится как есть, без вычисления хешей
+            hashes, starts = layout.hashes, layout.starts
+            for b in range(layout.capacity):
+                m.table[b] = [(hashes[i], *layout.entry(i)) for i in range(starts[b], starts[b + 1])]
+            m.size = layout.size
+        else:
+            m.put_many([layout.entry(i) for i in range(layout.size)])
+        layout.release()
+        return m
+
     def __len__(self) -> int:
         return self.size
     
     def __contains__(self, key: Hashable) -> bool:
-        h = self._hash(key)
-        return any(k == key for k, _ in self.table[h])
+        h = hash(key)
+        return any(eh == h and (k is key or k == key) for eh, k, _ in self.table[self._bucket(h)])
     
     def keys(self) -> Generator[Hashable, None, None]:
         """Генератор ключей"""
         for bucket in self.table:
-            for k, _ in bucket:
+            for _, k, _ in bucket:
                 yield k
 
     def items(self) -> Generator[Tuple[Hashable, T], None, None]:
         """Генератор пар ключ-значение"""
         for bucket in self.table:
-            yield from bucket
+            for _, k, v in bucket:
+                yield k, v
             
     
+class FrozenHashMap[T]:
+    # Неизменяемое представление файла HashMap.save(), отображённого в память: поиск читает
+    # только корзину ключа и десериализует лишь записи с совпавшим хешем.
+    # Записи читаются pickle: открывать можно только файлы из доверенного источника
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._file = _MapFile(self._mmap)
+        except ValueError:
+            self._mmap.close()
+            raise
+        if not self._file.same_hashes:
+            self.close()
+            raise ValueError("Hash seed differs from the saving process, use HashMap.load(path)")
+        self._mask = self._file.capacity - 1
+
+    def close(self) -> None:
+        """Освобождение отображения файла"""
+        if not self._mmap.closed:
+            self._file.release()
+            self._mmap.close()
+
+    def __enter__(self) -> 'FrozenHashMap[T]':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _find(self, key: Hashable) -> Any:
+        # Значение по ключу или _MISSING
+        h = hash(key)
+        f = self._file
+        b = h & self._mask
+        for i in range(f.starts[b], f.starts[b + 1]):
+            if f.hashes[i] == h:
+                k, v = f.entry(i)
+                if k is key or k == key:
+                    return v
+        return _MISSING
+
+    def get(self, key: Hashable) -> T:
+        """Получение значения по ключу"""
+        value = self._find(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __len__(self) -> int:
+        return self._file.size
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._find(key) is not _MISSING
+
+    def keys(self) -> Generator[Hashable, None, None]:
+        """Генератор ключей"""
+        for k, _ in self.items():
+            yield k
+
+    def items(self) -> Generator[Tuple[Hashable, T], None, None]:
+        """Генератор пар ключ-значение"""
+        for i in range(self._file.size):
+            yield self._file.entry(i)
+
+    def to_map(self) -> HashMap[T]:
+        """Построение изменяемой HashMap из отображённых данных"""
+        m = HashMap(self._file.capacity, self._file.load_factor, self._file.incremental)
+        m.min_capacity = self._file.min_capacity
+        m.put_many(self.items())
+        return m
+
+
+class CompactHashMap[T]:
+    # Открытая адресация по схеме компактного словаря CPython: разреженный массив индексов
+    # и плотные массивы хешей, ключей и значений в порядке вставки
+    def __init__(self, capacity=16, load_factor=0.75) -> None:
+        _check_capacity(capacity, load_factor)
+        if load_factor >= 1:
+            raise ValueError("Load factor must be less than 1 for open addressing")
+        self.capacity = 1 << max(capacity - 1, 7).bit_length() # Степень двойки не меньше 8
+        self.min_capacity = self.capacity
+        self.load_factor = load_factor
+        self.size = 0
+        self.indices = self._new_indices(self.capacity)
+        self.hashes = array('q')
+        self.entry_keys: list[Hashable] = []
+        self.entry_values: list[T] = []
+        self._stats: dict | None = None
+
+    @staticmethod
+    def _new_indices(capacity: int) -> array:
+        # Самый узкий целый тип, вмещающий номера записей
+        for typecode in "bhiq":
+            if capacity < 1 << (8 * array(typecode).itemsize - 1):
+                return array(typecode, [_EMPTY]) * capacity
+        raise OverflowError("Capacity is too large")
+
+    def _lookup(self, key: Hashable, h: int) -> Tuple[int, int]:
+        # Возвращает (слот индекса, номер записи); для отсутствующего ключа номер записи равен _EMPTY,
+        # а слот -- первый пригодный для вставки
+        mask = self.capacity - 1
+        indices, hashes, entry_keys = self.indices, self.hashes, self.entry_keys
+        perturb = h & 0xFFFFFFFFFFFFFFFF
+        i = h & mask
+        free = -1
+        while True:
+            ix = indices[i]
+            if ix == _EMPTY:
+                return (i if free < 0 else free), _EMPTY
+            if ix == _DUMMY:
+                if free < 0:
+                    free = i
+            elif hashes[ix] == h:
+                k = entry_keys[ix]
+                if k is key or k == key:
+                    return i, ix
+            perturb >>= _PERTURB_SHIFT
+            i = (i * 5 + perturb + 1) & mask
+
+    def _find(self, key: Hashable) -> int:
+        # Номер записи с ключом key или _EMPTY; упрощённый _lookup для чтения
+        h = hash(key)
+        mask = self.capacity - 1
+        indices, hashes, entry_keys = self.indices, self.hashes, self.entry_keys
+        perturb = h & 0xFFFFFFFFFFFFFFFF
+        i = h & mask
+        while True:
+            ix = indices[i]
+            if ix == _EMPTY:
+                return _EMPTY
+            if ix >= 0 and hashes[ix] == h:
+                k = entry_keys[ix]
+                if k is key or k == key:
+                    return ix
+            perturb >>= _PERTURB_SHIFT
+            i = (i * 5 + perturb + 1) & mask
+
+    def _resize(self) -> None:
+        # Если живых записей больше половины допустимого количества, удваиваем индекс,
+        # иначе достаточно выбросить удалённые записи
+        if self.size + 1 > self.capacity * self.load_factor / 2:
+            self._rebuild(self.capacity * 2)
+        else:
+            self._rebuild(self.capacity)
+
+    def _rebuild(self, capacity: int) -> None:
+        # Выбрасываем удалённые записи из плотных массивов и заново строим индекс
+        self.capacity = capacity
+        live = [i for i, k in enumerate(self.entry_keys) if k is not _DELETED]
+        self.hashes = array('q', [self.hashes[i] for i in live])
+        self.entry_keys = [self.entry_keys[i] for i in live]
+        self.entry_values = [self.entry_values[i] for i in live]
+        self.indices = indices = self._new_indices(self.capacity)
+        mask = self.capacity - 1
+        for ix, h in enumerate(self.hashes):
+            # Ключи различны, поэтому сравнение ключей не нужно -- ищем первый свободный слот
+            perturb = h & 0xFFFFFFFFFFFFFFFF
+            i = h & mask
+            while indices[i] != _EMPTY:
+                perturb >>= _PERTURB_SHIFT
+                i = (i * 5 + perturb + 1) & mask
+            indices[i] = ix
+
+    def put(self, key: Hashable, value: T) -> None:
+        """Добавление элемента"""
+        h = hash(key)
+        slot, ix = self._lookup(key, h)
+        if ix >= 0:
+            self.entry_values[ix] = value # Обновление значения
+            return
+        if len(self.entry_keys) + 1 > self.capacity * self.load_factor:
+            self._resize()
+            slot, _ = self._lookup(key, h)
+        self.indices[slot] = len(self.entry_keys)
+        self.hashes.append(h)
+        self.entry_keys.append(key)
+        self.entry_values.append(value)
+        self.size += 1
+
+    def get(self, key: Hashable) -> T:
+        """Получение значения по ключу"""
+        ix = self._find(key)
+        if ix < 0:
+            raise KeyError(key)
+        return self.entry_values[ix]
+
+    def remove(self, key: Hashable) -> None:
+        """Удаление элемента по ключу"""
+        slot, ix = self._lookup(key, hash(key))
+        if ix < 0:
+            raise KeyError(key)
+        self.indices[slot] = _DUMMY
+        self.entry_keys[ix] = _DELETED
+        self.entry_values[ix] = None
+        self.size -= 1
+        self._maybe_shrink()
+
+    def _maybe_shrink(self) -> None:
+        # Тот же гистерезис, что и в HashMap
+        if self.capacity > self.min_capacity and self.size < self.capacity * self.load_factor / 4:
+            self._rebuild(_capacity_for(self.size, self.load_factor / 2, self.min_capacity))
+
+    def reserve(self, n: int) -> None:
+        """Резервирование места под n элементов; ёмкость не опускается ниже резерва до вызова compact()"""
+        capacity = _capacity_for(n, self.load_factor, self.min_capacity)
+        self.min_capacity = capacity
+        if capacity > self.capacity:
+            self._rebuild(capacity)
+
+    def compact(self) -> None:
+        """Сжатие таблицы до минимальной ёмкости, вмещающей текущие элементы; сбрасывает резерв"""
+        self.min_capacity = 8
+        self._rebuild(_capacity_for(self.size, self.load_factor, 8))
+
+    @classmethod
+    def from_items(cls, items: Union[Mapping, Iterable[Tuple[Hashable, T]]], load_factor=0.75) -> 'CompactHashMap[T]':
+        """Построение таблицы из пар ключ-значение с однократным выделением памяти"""
+        m = cls(load_factor=load_factor)
+        m.put_many(items)
+        return m
+
+    def put_many(self, items: Union[Mapping, Iterable[Tuple[Hashable, T]]]) -> None:
+        """Пакетное добавление пар ключ-значение; таблица перестраивается не более одного раза"""
+        items = _pairs(items)
+        if len(self.entry_keys) + len(items) > self.capacity * self.load_factor:
+            self._rebuild(_capacity_for(self.size + len(items), self.load_factor, self.capacity))
+        indices, hashes, entry_keys, entry_values = self.indices, self.hashes, self.entry_keys, self.entry_values
+        for key, value in items:
+            h = hash(key)
+            slot, ix = self._lookup(key, h)
+            if ix >= 0:
+                entry_values[ix] = value
+                continue
+            indices[slot] = len(entry_keys)
+            hashes.append(h)
+            entry_keys.append(key)
+            entry_values.append(value)
+            self.size += 1
+
+    def get_many(self, keys: Iterable[Hashable], default: Any = _MISSING) -> List[T]:
+        """Пакетное получение значений; без default отсутствующий ключ вызывает KeyError"""
+        result = []
+        for key in keys:
+            ix = self._find(key)
+            if ix >= 0:
+                result.append(self.entry_values[ix])
+            elif default is _MISSING:
+                raise KeyError(key)
+            else:
+                result.append(default)
+        return result
+
+    def remove_many(self, keys: Iterable[Hashable]) -> int:
+        """Пакетное удаление ключей; отсутствующие ключи пропускаются. Возвращает количество удалённых элементов"""
+        removed = 0
+        for key in keys:
+            slot, ix = self._lookup(key, hash(key))
+            if ix >= 0:
+                self.indices[slot] = _DUMMY
+                self.entry_keys[ix] = _DELETED
+                self.entry_values[ix] = None
+                removed += 1
+        self.size -= removed
+        self._maybe_shrink()
+        return removed
+
+    def enable_stats(self, hook: Callable[[str, float], None] | None = None) -> None:
+        """Включение счётчиков длины проб и перестроений; hook(событие, значение) получает каждое событие"""
+        _enable_stats(self, hook)
+
+    def disable_stats(self) -> None:
+        """Отключение счётчиков и сброс накопленной статистики"""
+        _disable_stats(self)
+
+    def _measured_lookup(self, key: Hashable, h: int) -> Tuple[int, int]:
+        # _lookup, который считает просмотренные слоты индекса (длину пробы)
+        mask = self.capacity - 1
+        indices, hashes, entry_keys = self.indices, self.hashes, self.entry_keys
+        perturb = h & 0xFFFFFFFFFFFFFFFF
+        i = h & mask
+        free = -1
+        length = 1
+        while True:
+            ix = indices[i]
+            if ix == _EMPTY:
+                _record_probe(self, length)
+                return (i if free < 0 else free), _EMPTY
+            if ix == _DUMMY:
+                if free < 0:
+                    free = i
+            elif hashes[ix] == h:
+                k = entry_keys[ix]
+                if k is key or k == key:
+                    _record_probe(self, length)
+                    return i, ix
+            perturb >>= _PERTURB_SHIFT
+            i = (i * 5 + perturb + 1) & mask
+            length += 1
+
+    def _measured_find(self, key: Hashable) -> int:
+        # Последовательность слотов та же, что у _lookup, поэтому и длина пробы та же
+        return self._measured_lookup(key, hash(key))[1]
+
+    def stats(self) -> dict:
+        """Заполненность индекса и плотных массивов, а при включённой статистике -- длины проб и перестроения"""
+        result = {
+            "size": self.size,
+            "capacity": self.capacity,
+            "load": len(self.entry_keys) / self.capacity,
+            "deleted": len(self.entry_keys) - self.size,
+        }
+        if self._stats is not None:
+            result.update(_counters(self))
+        return result
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._find(key) >= 0
+
+    def keys(self) -> Generator[Hashable, None, None]:
+        """Генератор ключей в порядке вставки"""
+        for k in self.entry_keys:
+            if k is not _DELETED:
+                yield k
+
+    def items(self) -> Generator[Tuple[Hashable, T], None, None]:
+        """Генератор пар ключ-значение в порядке вставки"""
+        for k, v in zip(self.entry_keys, self.entry_values):
+            if k is not _DELETED:
+                yield k, v
+
+
+class ConcurrentHashMap[T]:
+    # Потокобезопасная таблица из независимых сегментов HashMap, у каждого сегмента свой замок.
+    # Чтение идёт без замка и проверяется счётчиком версий сегмента (seqlock): запись делает счётчик
+    # нечётным на время изменения, и если он изменился за время чтения, чтение повторяется под замком
+    def __init__(self, capacity=16, load_factor=0.75, segments=16) -> None:
+        _check_capacity(capacity, load_factor)
+        if segments < 1 or segments & (segments - 1):
+            raise ValueError("Number of segments must be a power of two")
+        # Сегменты не используют постепенное расширение: их get изменял бы таблицу при чтении без замка
+        self._segments = [HashMap[T](max(capacity // segments, 1), load_factor) for _ in range(segments)]
+        self._locks = [threading.Lock() for _ in range(segments)]
+        self._versions = [0] * segments
+        self._shift = 64 - (segments - 1).bit_length()
+
+    def _segment_of(self, key: Hashable) -> int:
+        # Сегмент определяется старшими битами перемешанного хеша, а корзина внутри сегмента -- младшими,
+        # поэтому ключи одного сегмента распределяются по всем его корзинам
+        if len(self._segments) == 1:
+            return 0
+        return ((hash(key) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+
+    def _write(self, i: int, func: Callable[[HashMap[T]], Any]) -> Any:
+        with self._locks[i]:
+            self._versions[i] += 1
+            try:
+                return func(self._segments[i])
+            finally:
+                self._versions[i] += 1
+
+    def _read(self, i: int, func: Callable[[HashMap[T]], Any]) -> Any:
+        version = self._versions[i]
+        if not version & 1:
+            try:
+                result, error = func(self._segments[i]), None
+            except KeyError as e:
+                result, error = None, e
+            except Exception:
+                # Таблица наблюдалась в момент перестроения -- повторяем под замком
+                version = -1
+            if self._versions[i] == version:
+                if error is not None:
+                    raise error
+                return result
+        with self._locks[i]:
+            return func(self._segments[i])
+
+    def put(self, key: Hashable, value: T) -> None:
+        """Добавление элемента"""
+        self._write(self._segment_of(key), lambda segment: segment.put(key, value))
+
+    def get(self, key: Hashable) -> T:
+        """Получение значения по ключу"""
+        return self._read(self._segment_of(key), lambda segment: segment.get(key))
+
+    def remove(self, key: Hashable) -> None:
+        """Удаление элемента по ключу"""
+        self._write(self._segment_of(key), lambda segment: segment.remove(key))
+
+    def put_if_absent(self, key: Hashable, value: T) -> T:
+        """Атомарное добавление элемента, если ключа нет; возвращает значение, хранящееся по ключу после вызова"""
+        def put_if_absent(segment: HashMap[T]) -> T:
+            try:
+                return segment.get(key)
+            except KeyError:
+                segment.put(key, value)
+                return value
+        return self._write(self._segment_of(key), put_if_absent)
+
+    def compute(self, key: Hashable, func: Callable[[Any], T], default: Any = None) -> T:
+        """Атомарное обновление: по ключу записывается func(текущее значение или default); возвращает новое значение.
+        func выполняется под замком сегмента и не должна обращаться к этой же таблице"""
+        def compute(segment: HashMap[T]) -> T:
+            try:
+                current = segment.get(key)
+            except KeyError:
+                current = default
+            value = func(current)
+            segment.put(key, value)
+            return value
+        return self._write(self._segment_of(key), compute)
+
+    def _group(self, keys: Iterable[Any], key_of: Callable[[Any], Hashable]) -> List[List[Any]]:
+        groups: List[List[Any]] = [[] for _ in self._segments]
+        for item in keys:
+            groups[self._segment_of(key_of(item))].append(item)
+        return groups
+
+    def put_many(self, items: Union[Mapping, Iterable[Tuple[Hashable, T]]]) -> None:
+        """Пакетное добавление пар ключ-значение; замок каждого сегмента берётся один раз"""
+        for i, group in enumerate(self._group(_pairs(items), lambda item: item[0])):
+            if group:
+                self._write(i, lambda segment: segment.put_many(group))
+
+    def get_many(self, keys: Iterable[Hashable], default: Any = _MISSING) -> List[T]:
+        """Пакетное получение значений; без default отсутствующий ключ вызывает KeyError"""
+        result = []
+        for key in keys:
+            try:
+                result.append(self.get(key))
+            except KeyError:
+                if default is _MISSING:
+                    raise
+                result.append(default)
+        return result
+
+    def remove_many(self, keys: Iterable[Hashable]) -> int:
+        """Пакетное удаление ключей; отсутствующие ключи пропускаются. Возвращает количество удалённых элементов"""
+        removed = 0
+        for i, group in enumerate(self._group(keys, lambda key: key)):
+            if group:
+                removed += self._write(i, lambda segment: segment.remove_many(group))
+        return removed
+
+    def reserve(self, n: int) -> None:
+        """Резервирование места под n элементов (поровну между сегментами)"""
+        per_segment = -(-n // len(self._segments))
+        for i in range(len(self._segments)):
+            self._write(i, lambda segment: segment.reserve(per_segment))
+
+    def compact(self) -> None:
+        """Сжатие всех сегментов до текущего количества элементов"""
+        for i in range(len(self._segments)):
+            self._write(i, lambda segment: segment.compact())
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self._segments)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._read(self._segment_of(key), lambda segment: key in segment)
+
+    def keys(self) -> Generator[Hashable, None, None]:
+        """Генератор ключей; каждый сегмент копируется под замком, поэтому обход не мешает записи"""
+        for k, _ in self.items():
+            yield k
+
+    def items(self) -> Generator[Tuple[Hashable, T], None, None]:
+        """Генератор пар ключ-значение"""
+        for i in range(len(self._segments)):
+            with self._locks[i]:
+                items = list(self._segments[i].items())
+            yield from items
+
+
+class _CacheEntry:
+    # Запись кэша и одновременно узел двусвязного списка LRU (значение в хеш-таблице кэша)
+    __slots__ = ("key", "value", "size", "expires", "prev", "next")
+
+    def __init__(self, key: Hashable = None, value: Any = None, size: int = 0, expires: float | None = None) -> None:
+        self.key = key
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.prev: '_CacheEntry' = self
+        self.next: '_CacheEntry' = self
+
+
+class LRUCache[T]:
+    # Ограниченный кэш на хеш-таблице: записи связаны в кольцевой список в порядке использования,
+    # поэтому обращение, вставка и вытеснение самой давно использованной записи выполняются за O(1)
+    def __init__(self, max_size: int | None = None, max_bytes: int | None = None, ttl: float | None = None,
+                 on_evict: Callable[[Hashable, T, str], None] | None = None,
+                 sizeof: Callable[[Hashable, T], int] | None = None,
+                 map_type: type = HashMap, clock: Callable[[], float] = time.monotonic) -> None:
+        if max_size is not None and max_size < 1:
+            raise ValueError("Max size must be positive")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("Max bytes must be positive")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("TTL must be positive")
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.on_evict = on_evict # on_evict(ключ, значение, причина), причина -- "capacity" или "expired"
+        self.sizeof = sizeof or (lambda key, value: sys.getsizeof(key) + sys.getsizeof(value))
+        self.clock = clock
+        self.map = map_type()
+        self._root = _CacheEntry() # root.next -- самая давно использованная запись, root.prev -- последняя
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _unlink(self, entry: _CacheEntry) -> None:
+        entry.prev.next = entry.next
+        entry.next.prev = entry.prev
+
+    def _append(self, entry: _CacheEntry) -> None:
+        last = self._root.prev
+        last.next = entry
+        entry.prev = last
+        entry.next = self._root
+        self._root.prev = entry
+
+    def _discard(self, entry: _CacheEntry, reason: str | None) -> None:
+        self.map.remove(entry.key)
+        self._unlink(entry)
+        self.bytes -= entry.size
+        if reason and self.on_evict:
+            self.on_evict(entry.key, entry.value, reason)
+
+    def _lookup(self, key: Hashable) -> _CacheEntry | None:
+        # Запись по ключу; просроченная запись удаляется при обращении
+        try:
+            entry = self.map.get(key)
+        except KeyError:
+            return None
+        if entry.expires is not None and entry.expires <= self.clock():
+            self.expirations += 1
+            self._discard(entry, "expired")
+            return None
+        return entry
+
+    def put(self, key: Hashable, value: T, ttl: float | None = None) -> None:
+        """Добавление элемента; ttl переопределяет время жизни по умолчанию"""
+        if ttl is None:
+            ttl = self.ttl
+        elif ttl <= 0:
+            raise ValueError("TTL must be positive")
+        size = self.sizeof(key, value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            raise ValueError("Entry is larger than max bytes")
+        expires = self.clock() + ttl if ttl is not None else None
+        try:
+            entry = self.map.get(key)
+        except KeyError:
+            entry = _CacheEntry(key, value, size, expires)
+            self.map.put(key, entry)
+        else:
+            self._unlink(entry)
+            self.bytes -= entry.size
+            entry.value, entry.size, entry.expires = value, size, expires
+        self._append(entry)
+        self.bytes += size
+        # Вытесняем самые давно использованные записи, пока не уложимся в ограничения
+        while ((self.max_size is not None and len(self.map) > self.max_size)
+               or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            self.evictions += 1
+            self._discard(self._root.next, "capacity")
+
+    def get(self, key: Hashable, default: Any = _MISSING) -> T:
+        """Получение значения по ключу с переносом записи в конец очереди вытеснения;
+        без default отсутствующий ключ вызывает KeyError"""
+        entry = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        self.hits += 1
+        self._unlink(entry)
+        self._append(entry)
+        return entry.value
+
+    def remove(self, key: Hashable) -> None:
+        """Удаление элемента по ключу"""
+        entry = self._lookup(key)
+        if entry is None:
+            raise KeyError(key)
+        self._discard(entry, None)
+
+    def __setitem__(self, key: Hashable, value: T) -> None:
+        self.put(key, value)
+
+    def __getitem__(self, key: Hashable) -> T:
+        return self.get(key)
+
+    def __delitem__(self, key: Hashable) -> None:
+        self.remove(key)
+
+    def expire(self) -> int:
+        """Удаление всех просроченных записей за O(n); возвращает количество удалённых записей"""
+        now = self.clock()
+        expired = 0
+        entry = self._root.next
+        while entry is not self._root:
+            following = entry.next
+            if entry.expires is not None and entry.expires <= now:
+                self.expirations += 1
+                self._discard(entry, "expired")
+                expired += 1
+            entry = following
+        return expired
+
+    def clear(self) -> None:
+        """Удаление всех записей (без вызова on_evict)"""
+        self.map = type(self.map)()
+        self._root.prev = self._root.next = self._root
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        """Счётчики попаданий, промахов, вытеснений и истечений срока, а также занятый объём"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.map),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def __len__(self) -> int:
+        return len(self.map)
+
+    def __contains__(self, key: Hashable) -> bool:
+        # Проверка не меняет порядок вытеснения и не учитывается в попаданиях
+        return self._lookup(key) is not None
+
+    def __str__(self) -> str:
+        return "{" + ", ".join([f"{k}: {v}" for k, v in self.items()]) + "}"
+
+    def __iter__(self) -> Generator[Hashable, None, None]:
+        yield from self.keys()
+
+    def keys(self) -> Generator[Hashable, None, None]:
+        """Генератор ключей от самого давно использованного к последнему"""
+        for k, _ in self.items():
+            yield k
+
+    def items(self) -> Generator[Tuple[Hashable, T], None, None]:
+        """Генератор пар ключ-значение от самой давно использованной записи к последней (без просроченных)"""
+        now = self.clock()
+        entry = self._root.next
+        while entry is not self._root:
+            if entry.expires is None or entry.expires > now:
+                yield entry.key, entry.value
+            entry = entry.next
+
+
 class AssociativeArray[T]:
-    def __init__(self) -> None:
-        self.map = HashMap[T]()
+    def __init__(self, map_type: type = HashMap) -> None:
+        # map_type -- реализация хеш-таблицы: HashMap (метод цепочек), CompactHashMap (открытая адресация)
+        # или ConcurrentHashMap (потокобезопасная)
+        self.map = map_type()
         
     def __setitem__(self, key: Hashable, value: T) -> None:
         self.map.put(key, value)
@@ -85,6 +1149,26 @@ class AssociativeArray[T]:
     
     def __delitem__(self, key: Hashable) -> None:
         self.map.remove(key)
+
+    def reserve(self, n: int) -> None:
+        """Резервирование места под n элементов"""
+        self.map.reserve(n)
+
+    def compact(self) -> None:
+        """Сжатие хеш-таблицы до текущего количества элементов"""
+        self.map.compact()
+
+    def update(self, items: Union[Mapping, Iterable[Tuple[Hashable, T]]]) -> None:
+        """Пакетное добавление пар из отображения или последовательности пар"""
+        self.map.put_many(items)
+
+    def get_many(self, keys: Iterable[Hashable], default: Any = _MISSING) -> List[T]:
+        """Пакетное получение значений; без default отсутствующий ключ вызывает KeyError"""
+        return self.map.get_many(keys, default)
+
+    def remove_many(self, keys: Iterable[Hashable]) -> int:
+        """Пакетное удаление ключей; возвращает количество удалённых элементов"""
+        return self.map.remove_many(keys)
         
     def __len__(self) -> int:
         return len(self.map)
@@ -1,4 +1,9 @@
-from dict_list import AssociativeArray
+from dict_list import AssociativeArray, CompactHashMap, ConcurrentHashMap, FrozenHashMap, HashMap, LRUCache
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 def test_insert():
     a = AssociativeArray()
@@ -96,5 +101,427 @@ def test_resize():
     assert len(a) == 0
     for i in range(1000):
         assert i not in a
-    assert a.map.capacity == 2048
+    # После удаления всех элементов таблица сжимается обратно
+    assert a.map.capacity == 16
     
+    
+def test_compact_basic():
+    a = AssociativeArray(CompactHashMap)
+    a[1] = 10
+    a[3] = 30
+    a[4] = 40
+    a[5] = 50
+    a[6] = 60
+    a[3] = 33
+    assert str(a) == "{1: 10, 3: 33, 4: 40, 5: 50, 6: 60}"
+    assert a[3] == 33
+    assert len(a) == 5
+    del a[3]
+    del a[5]
+    assert str(a) == "{1: 10, 4: 40, 6: 60}"
+    assert 3 not in a and 4 in a
+    a[3] = 30
+    assert list(a.keys()) == [1, 4, 6, 3]
+    try:
+        a[100]
+        assert False
+    except KeyError:
+        pass
+    try:
+        del a[100]
+        assert False
+    except KeyError:
+        pass
+    
+def test_compact_resize():
+    a = AssociativeArray(CompactHashMap)
+    for i in range(1000):
+        a[str(i)] = i
+    assert len(a) == 1000
+    for i in range(1000):
+        assert a[str(i)] == i
+    for i in range(0, 1000, 2):
+        del a[str(i)]
+    for i in range(1000, 3000):
+        a[str(i)] = i
+    assert list(a.keys()) == [str(i) for i in range(1, 1000, 2)] + [str(i) for i in range(1000, 3000)]
+    for i in range(3000):
+        assert (str(i) in a) == (i % 2 == 1 or i >= 1000)
+    assert a.map.capacity == 4096
+    assert len(a.map.entry_keys) < a.map.capacity
+    
+def test_compact_churn():
+    # Чередование вставок и удалений не должно бесконечно наращивать плотные массивы
+    m = CompactHashMap()
+    for i in range(10000):
+        m.put(i, i)
+        m.remove(i)
+    assert len(m) == 0
+    assert m.capacity == 16
+    assert len(m.entry_keys) <= m.capacity
+    
+def test_incremental_resize():
+    m = HashMap(incremental=True)
+    for i in range(13):
+        m.put(i, i)
+    # Порог превышен: расширение началось, но перенесено лишь несколько корзин
+    assert m._resizing == True
+    assert len(m.table) < 32
+    for i in range(13):
+        assert m.get(i) == i
+    for i in range(13, 1000):
+        m.put(i, i)
+    assert len(m) == 1000
+    for i in range(1000):
+        assert m.get(i) == i
+    for i in range(0, 1000, 2):
+        m.remove(i)
+    assert sorted(m.keys()) == list(range(1, 1000, 2))
+    for i in range(1000):
+        assert (i in m) == (i % 2 == 1)
+    while m._resizing:
+        m.get(1)
+    assert len(m.table) == m.capacity
+    
+class CountingKey:
+    hash_calls = 0
+    eq_calls = 0
+    
+    def __init__(self, value):
+        self.value = value
+        
+    def __hash__(self):
+        CountingKey.hash_calls += 1
+        return self.value
+    
+    def __eq__(self, other):
+        CountingKey.eq_calls += 1
+        return self.value == other.value
+    
+def test_cached_hashes():
+    m = HashMap(capacity=10)
+    assert m.capacity == 16
+    keys = [CountingKey(i) for i in range(1000)]
+    CountingKey.hash_calls = CountingKey.eq_calls = 0
+    for key in keys:
+        m.put(key, key.value)
+    # Расширения не пересчитывают хеши, а разные хеши не сравниваются через __eq__
+    assert CountingKey.hash_calls == 1000
+    assert CountingKey.eq_calls == 0
+    assert m.capacity == 2048
+    for key in keys:
+        assert m.get(CountingKey(key.value)) == key.value
+    assert CountingKey.eq_calls == 1000
+    
+def test_reserve():
+    for map_type in [HashMap, CompactHashMap]:
+        m = map_type()
+        m.reserve(1000)
+        capacity = m.capacity
+        assert capacity * m.load_factor >= 1000
+        for i in range(1000):
+            m.put(i, i)
+        assert m.capacity == capacity
+        # Резерв не сжимается при удалениях
+        for i in range(1000):
+            m.remove(i)
+        assert m.capacity == capacity
+        m.compact()
+        assert m.capacity <= 16
+        
+def test_shrink():
+    for map_type in [HashMap, CompactHashMap]:
+        m = map_type()
+        for i in range(10000):
+            m.put(i, i)
+        grown = m.capacity
+        for i in range(9900):
+            m.remove(i)
+        assert m.capacity < grown
+        assert 100 <= m.capacity * m.load_factor
+        assert [m.get(i) for i in range(9900, 10000)] == list(range(9900, 10000))
+        # Гистерезис: чередование вставки и удаления на границе не перестраивает таблицу каждый раз
+        capacity = m.capacity
+        for i in range(1000):
+            m.put(-1, -1)
+            m.remove(-1)
+        assert m.capacity == capacity
+    # Инкрементальная таблица не перестраивается целиком при удалении: сжатие только через compact()
+    m = HashMap(incremental=True)
+    for i in range(10000):
+        m.put(i, i)
+    while m._resizing:
+        m.get(0)
+    grown = m.capacity
+    m._rebuild = None # Любое полное перестроение вызовет TypeError
+    for i in range(9900):
+        m.remove(i)
+    m.remove_many(range(9900, 9950))
+    del m._rebuild
+    assert m.capacity == grown
+    m.compact()
+    assert m.capacity < grown
+    assert [m.get(i) for i in range(9950, 10000)] == list(range(9950, 10000))
+        
+def test_capacity_validation():
+    assert HashMap(capacity=100).capacity == 128
+    assert HashMap(capacity=1).capacity == 1
+    for args in [(0, 0.75), (16, 0)]:
+        try:
+            HashMap(*args)
+            assert False
+        except ValueError:
+            pass
+    try:
+        CompactHashMap(16, 1.0)
+        assert False
+    except ValueError:
+        pass
+    
+def test_compact():
+    m = HashMap()
+    for i in range(1000):
+        m.put(i, i)
+    for i in range(800):
+        m.remove(i)
+    m.compact()
+    assert m.capacity == 512
+    assert sorted(m.keys()) == list(range(800, 1000))
+    
+def test_bulk():
+    for map_type in [HashMap, CompactHashMap]:
+        a = AssociativeArray(map_type)
+        a.update({1: 10, 2: 20})
+        a.update([(3, 30), (1, 11)])
+        assert str(a) == "{1: 11, 2: 20, 3: 30}"
+        other = AssociativeArray(map_type)
+        other[2] = 21
+        other[4] = 40
+        a.update(other)
+        m = map_type()
+        m.put(2, 20)
+        a.update(m)
+        assert sorted(a.items()) == [(1, 11), (2, 20), (3, 30), (4, 40)]
+        assert a.remove_many([4]) == 1
+        assert a.get_many([3, 1, 5], default=None) == [30, 11, None]
+        try:
+            a.get_many([1, 5])
+            assert False
+        except KeyError:
+            pass
+        assert a.remove_many([1, 5, 1]) == 1
+        assert str(a) == "{2: 20, 3: 30}"
+        
+def test_from_items():
+    for map_type in [HashMap, CompactHashMap]:
+        items = [(str(i), i) for i in range(5000)]
+        m = map_type.from_items(items)
+        capacity = m.capacity
+        assert len(m) == 5000
+        assert m.get_many(str(i) for i in range(5000)) == list(range(5000))
+        m.put_many(items[:100])
+        assert m.capacity == capacity
+        m.put_many((str(i), i) for i in range(5000, 10000))
+        assert len(m) == 10000
+        assert m.remove_many(str(i) for i in range(9000)) == 9000
+        assert sorted(m.keys(), key=int) == [str(i) for i in range(9000, 10000)]
+        assert m.capacity < capacity
+    
+def test_concurrent_basic():
+    a = AssociativeArray(ConcurrentHashMap)
+    for i in range(1000):
+        a[i] = i * 10
+    assert len(a) == 1000
+    assert sorted(a.items()) == [(i, i * 10) for i in range(1000)]
+    for i in range(0, 1000, 2):
+        del a[i]
+    assert sorted(a.keys()) == list(range(1, 1000, 2))
+    assert 3 in a and 4 not in a
+    try:
+        a[4]
+        assert False
+    except KeyError:
+        pass
+    a.update({4: 40, 5: 50})
+    assert a.get_many([4, 5, 6], default=0) == [40, 50, 0]
+    assert a.remove_many([4, 5, 6]) == 2
+    
+def test_concurrent_threads():
+    m = ConcurrentHashMap(segments=8)
+    
+    def writer(start):
+        for i in range(start, start + 2000):
+            m.put(i, i)
+        for _ in range(500):
+            m.compute("counter", lambda v: v + 1, default=0)
+            
+    def reader():
+        for i in range(2000):
+            if i in m:
+                assert m.get(i) == i
+            
+    # result() пробрасывает в основной поток исключения потоков, в том числе проваленные assert читателей
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(writer, k * 2000) for k in range(4)]
+        futures += [pool.submit(reader) for _ in range(4)]
+        for future in futures:
+            future.result()
+    assert len(m) == 8001
+    assert m.get("counter") == 2000
+    assert all(m.get(i) == i for i in range(8000))
+    assert m.put_if_absent(1, 100) == 1
+    assert m.put_if_absent(-1, 100) == 100
+    assert m.get(-1) == 100
+    
+def test_stats():
+    for m in (HashMap(), HashMap(incremental=True), CompactHashMap()):
+        assert "lookups" not in m.stats()
+        events = []
+        m.enable_stats(lambda event, value: events.append(event))
+        for i in range(100):
+            m.put(i, i)
+        assert m.get(5) == 5
+        m.remove(5)
+        stats = m.stats()
+        assert stats["size"] == 99
+        # Вставка, вызвавшая перестроение CompactHashMap, заново ищет слот в новом индексе
+        extra = stats["resizes"] if isinstance(m, CompactHashMap) else 0
+        assert stats["lookups"] == 102 + extra
+        assert stats["resizes"] >= 3
+        assert stats["resize_seconds"] > 0
+        assert stats["probe_length"]["max"] >= 1
+        assert events.count("probe") == 102 + extra
+        assert "resize" in events
+        m.disable_stats()
+        m.put(5, 5)
+        assert "lookups" not in m.stats()
+        assert not set(m.__dict__) & {"put", "get", "remove", "_lookup", "_find"}
+    
+    m = HashMap()
+    for i in range(8):
+        m.put(i * 16, i) # Все ключи попадают в корзину 0
+    m.enable_stats()
+    m.get(7 * 16)
+    stats = m.stats()
+    assert stats["buckets"] == {0: 15, 8: 1}
+    assert stats["probe_length"]["histogram"] == {8: 1}
+    
+def test_save_load():
+    m = HashMap(incremental=True)
+    for i in range(1000):
+        m.put(f"key{i}", [i])
+    m.put((1, 2), None)
+    m.remove("key7")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "map.bin")
+        m.save(path)
+        loaded = HashMap.load(path)
+        assert len(loaded) == 1000
+        assert loaded.get("key999") == [999]
+        assert loaded.get((1, 2)) is None
+        assert "key7" not in loaded
+        assert sorted(loaded.items(), key=str) == sorted(m.items(), key=str)
+        loaded.put("key7", 7)
+        assert loaded.get("key7") == 7
+        with HashMap.load(path, mmap=True) as frozen:
+            assert isinstance(frozen, FrozenHashMap)
+            assert len(frozen) == 1000
+            assert frozen.get("key500") == [500]
+            assert "key7" not in frozen
+            assert sorted(frozen.keys(), key=str) == sorted(m.keys(), key=str)
+            assert frozen.to_map().get((1, 2)) is None
+        # Таблица сохраняется и открывается в процессах с разными PYTHONHASHSEED: таблица с целыми ключами
+        # и кортежами открывается через mmap, таблица со строковыми ключами -- только перестроением
+        numbers_path = os.path.join(directory, "numbers.bin")
+        save = (
+            "from dict_list import HashMap\n"
+            "numbers, strings = HashMap(), HashMap()\n"
+            "for i in range(1000):\n"
+            "    numbers.put((i, -i) if i % 2 else i, i)\n"
+            "    strings.put(f'key{i}', [i])\n"
+            f"numbers.save({numbers_path!r})\n"
+            f"strings.save({path!r})\n"
+        )
+        load = (
+            "from dict_list import HashMap\n"
+            f"with HashMap.load({numbers_path!r}, mmap=True) as frozen:\n"
+            "    assert frozen.get(998) == 998 and frozen.get((999, -999)) == 999 and 997 not in frozen\n"
+            f"try:\n    HashMap.load({path!r}, mmap=True)\n    assert False\nexcept ValueError:\n    pass\n"
+            f"assert HashMap.load({path!r}).get('key999') == [999]\n"
+        )
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        for script, seed in ((save, "1"), (load, "2")):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            subprocess.run([sys.executable, "-c", script], env=env, cwd=cwd, check=True)
+        HashMap().save(path)
+        assert len(HashMap.load(path)) == 0
+        with open(path, "r+b") as f:
+            f.write(b"XXXX")
+        try:
+            HashMap.load(path)
+            assert False
+        except ValueError:
+            pass
+    
+def test_lru_cache():
+    evicted = []
+    cache = LRUCache(max_size=3, on_evict=lambda key, value, reason: evicted.append((key, reason)))
+    for i in range(3):
+        cache[i] = i * 10
+    assert cache[0] == 0 # 0 становится последней использованной записью
+    cache[3] = 30
+    assert evicted == [(1, "capacity")]
+    assert list(cache.keys()) == [2, 0, 3]
+    assert cache.get(1, None) is None
+    cache[2] = 200
+    cache[4] = 40
+    assert list(cache.items()) == [(3, 30), (2, 200), (4, 40)]
+    del cache[3]
+    assert 3 not in cache
+    assert len(cache) == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 2)
+    try:
+        cache[1]
+        assert False
+    except KeyError:
+        pass
+    
+def test_lru_cache_ttl():
+    now = [0.0]
+    evicted = []
+    cache = LRUCache(ttl=10, clock=lambda: now[0], on_evict=lambda key, value, reason: evicted.append((key, reason)))
+    cache["a"] = 1
+    cache.put("b", 2, ttl=100)
+    cache["c"] = 3
+    now[0] = 5
+    assert cache["a"] == 1
+    now[0] = 20
+    assert "a" not in cache
+    assert list(cache.keys()) == ["b"]
+    assert len(cache) == 2 # "c" истекла, но ещё не удалена
+    assert cache.expire() == 1
+    assert cache.get("b") == 2
+    assert evicted == [("a", "expired"), ("c", "expired")]
+    assert cache.stats()["expirations"] == 2
+    
+def test_lru_cache_bytes():
+    cache = LRUCache(max_bytes=100, sizeof=lambda key, value: len(value))
+    cache[1] = "x" * 40
+    cache[2] = "x" * 40
+    cache[3] = "x" * 30
+    assert list(cache.keys()) == [2, 3]
+    assert cache.bytes == 70
+    cache[2] = "x" * 10
+    assert cache.bytes == 40
+    try:
+        cache[4] = "x" * 101
+        assert False
+    except ValueError:
+        pass
+    for bad in ({"max_size": 0}, {"max_bytes": -1}, {"ttl": 0}):
+        try:
+            LRUCache(**bad)
+            assert False
+        except ValueError:
+            pass
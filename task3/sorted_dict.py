@@ -0,0 +1,104 @@
+import os
+import sys
+from typing import Any, Generator, Hashable, Tuple
+
+# АВЛ-дерево и хеш-таблица лежат в каталогах task1 и task2
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _task in ("task1", "task2"):
+    _path = os.path.join(_ROOT, _task)
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from avl import AVLTree
+from dict_list import HashMap
+
+class OrderIndex(AVLTree):
+    # АВЛ-дерево для ключей любого сравнимого типа, а не только положительных целых
+    def _check_key(self, key: Any) -> None:
+        if key is None:
+            raise ValueError("Key must not be None")
+
+class SortedAssociativeArray[T]:
+    # Значения хранятся в хеш-таблице (поиск по ключу за O(1)), а порядок ключей -- в АВЛ-дереве
+    # (упорядоченный обход, floor/ceiling и удаление диапазона за O(log n))
+    def __init__(self, map_type: type = HashMap) -> None:
+        self.map = map_type()
+        self.order = OrderIndex()
+
+    def __setitem__(self, key: Hashable, value: T) -> None:
+        if key not in self.map:
+            self.order.insert(key)
+        self.map.put(key, value)
+
+    def __getitem__(self, key: Hashable) -> T:
+        return self.map.get(key)
+
+    def __delitem__(self, key: Hashable) -> None:
+        self.map.remove(key)
+        self.order.remove(key)
+
+    def __len__(self) -> int:
+        return len(self.map)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.map
+
+    def __str__(self) -> str:
+        return "{" + ", ".join([f"{k}: {v}" for k, v in self.items()]) + "}"
+
+    def __iter__(self) -> Generator[Hashable, None, None]:
+        yield from self.order
+
+    def __reversed__(self) -> Generator[Hashable, None, None]:
+        yield from reversed(self.order)
+
+    def keys(self) -> Generator[Hashable, None, None]:
+        """Генератор ключей по возрастанию"""
+        yield from self.order
+
+    def items(self) -> Generator[Tuple[Hashable, T], None, None]:
+        """Генератор пар ключ-значение по возрастанию ключей"""
+        for key in self.order:
+            yield key, self.map.get(key)
+
+    def min(self) -> Hashable:
+        """Минимальный ключ"""
+        return self.order.min()
+
+    def max(self) -> Hashable:
+        """Максимальный ключ"""
+        return self.order.max()
+
+    def floor(self, key: Hashable) -> Hashable:
+        """Наибольший ключ, не превосходящий key; KeyError, если такого нет"""
+        result = self.order.floor(key)
+        if result is None:
+            raise KeyError(key)
+        return result
+
+    def ceiling(self, key: Hashable) -> Hashable:
+        """Наименьший ключ, не меньший key; KeyError, если такого нет"""
+        result = self.order.ceiling(key)
+        if result is None:
+            raise KeyError(key)
+        return result
+
+    def irange(self, lo: Hashable, hi: Hashable, inclusive: Tuple[bool, bool] = (True, True)) -> Generator[Tuple[Hashable, T], None, None]:
+        """Генератор пар ключ-значение с ключами из диапазона [lo, hi] по возрастанию"""
+        for key in self.order.iter_range(lo, hi, inclusive):
+            yield key, self.map.get(key)
+
+    def remove_range(self, lo: Hashable, hi: Hashable) -> int:
+        """Удаление всех ключей отрезка [lo, hi]; возвращает количество удалённых элементов"""
+        removed = self.order.remove_range(lo, hi)
+        return self.map.remove_many(removed)
+
+    def index(self, key: Hashable) -> int:
+        """Позиция ключа в порядке возрастания (количество меньших ключей); KeyError, если ключа нет"""
+        if key not in self.map:
+            raise KeyError(key)
+        return self.order.rank(key)
+
+    def key_at(self, i: int) -> Hashable:
+        """i-й по возрастанию ключ (отрицательные индексы отсчитываются с конца)"""
+        return self.order.select(i)
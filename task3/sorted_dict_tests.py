@@ -0,0 +1,76 @@
+from sorted_dict import OrderIndex, SortedAssociativeArray
+from dict_list import CompactHashMap
+import random
+
+def test_insert():
+    a = SortedAssociativeArray()
+    for key in [5, 1, 4, 3, 6]:
+        a[key] = key * 10
+    a[4] = 400
+    assert str(a) == "{1: 10, 3: 30, 4: 400, 5: 50, 6: 60}"
+    assert len(a) == 5
+    assert a[4] == 400
+    assert 3 in a
+    assert 2 not in a
+
+def test_remove():
+    a = SortedAssociativeArray()
+    for key in range(10):
+        a[key] = str(key)
+    del a[0]
+    del a[5]
+    assert list(a) == [1, 2, 3, 4, 6, 7, 8, 9]
+    assert list(reversed(a)) == [9, 8, 7, 6, 4, 3, 2, 1]
+    try:
+        del a[5]
+        assert False
+    except KeyError:
+        pass
+    assert len(a) == 8
+
+def test_generic_keys():
+    a = SortedAssociativeArray(map_type=CompactHashMap)
+    for word in ["pear", "apple", "fig", "banana", "cherry"]:
+        a[word] = len(word)
+    assert list(a.keys()) == ["apple", "banana", "cherry", "fig", "pear"]
+    assert a.floor("c") == "banana"
+    assert a.ceiling("c") == "cherry"
+    assert a.floor("cherry") == "cherry"
+    assert list(a.irange("b", "g")) == [("banana", 6), ("cherry", 6), ("fig", 3)]
+    assert a.min() == "apple" and a.max() == "pear"
+    try:
+        a.floor("a")
+        assert False
+    except KeyError:
+        pass
+    tree = OrderIndex()
+    tree.insert_many([(2, "b"), (1, "z"), (2, "a")])
+    assert tree.traverse("inorder") == [(1, "z"), (2, "a"), (2, "b")]
+    assert tree.validate_avl() == True
+
+def test_ordered_queries():
+    keys = random.sample(range(-1000, 1000), 500)
+    a = SortedAssociativeArray()
+    for key in keys:
+        a[key] = -key
+    ordered = sorted(keys)
+    assert list(a.items()) == [(key, -key) for key in ordered]
+    assert [a.key_at(i) for i in range(0, 500, 50)] == ordered[::50]
+    assert a.key_at(-1) == ordered[-1]
+    assert a.index(ordered[123]) == 123
+    assert list(a.irange(-100, 100, (False, True))) == [(key, -key) for key in ordered if -100 < key <= 100]
+
+def test_remove_range():
+    keys = random.sample(range(1, 1000), 300)
+    a = SortedAssociativeArray()
+    for key in keys:
+        a[key] = key
+    removed = a.remove_range(200, 600)
+    assert removed == len([key for key in keys if 200 <= key <= 600])
+    assert list(a) == sorted(key for key in keys if not 200 <= key <= 600)
+    assert len(a) == 300 - removed
+    assert all(key not in a for key in range(200, 601))
+    assert a.remove_range(600, 200) == 0
+    a[300] = 1
+    assert a.floor(599) == 300
+    assert a.order.validate_avl() == True